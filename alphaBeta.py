@@ -1,90 +1,265 @@
 from connect4 import Connect4GUI, Connect4Game
+from bitboard import Connect4Bitboard, ROWS, COLS, H1, has_four
 from player import Player, MousePlayer
-import random
-import copy
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from opening_book import load_book
+from threats import analyze, forced_winner
+from symmetry import canonical_hash, mirror_move
+import time
+
+
+# every window of four cells as bitboard positions (col * H1 + height)
+WINDOWS = (
+  [[(c + i) * H1 + h for i in range(4)] for h in range(ROWS) for c in range(COLS - 3)] +
+  [[c * H1 + h + i for i in range(4)] for c in range(COLS) for h in range(ROWS - 3)] +
+  [[(c + i) * H1 + h + i for i in range(4)] for h in range(ROWS - 3) for c in range(COLS - 3)] +
+  [[(c + i) * H1 + h - i for i in range(4)] for h in range(3, ROWS) for c in range(COLS - 3)]
+)
+
+# for each bitboard position, the indices of the windows that contain it
+CELL_WINDOWS = [[w for w, window in enumerate(WINDOWS) if pos in window] for pos in range(COLS * H1)]
+
+# static move order: center columns first
+CENTER_ORDER = sorted(range(COLS), key=lambda col: abs(col - COLS // 2))
+
+
+# score of a window holding `own` and `opp` pieces, matching AlphaBetaPlayer.check_window
+def window_score(own, opp):
+  def one_side(mine, theirs):
+    empty = 4 - mine - theirs
+    util = 0
+    if mine == 4:
+      util += 1000000
+    elif mine == 3 and empty == 1:
+      util += 500
+    elif mine == 2 and empty == 2:
+      util += 20
+    if theirs == 4:
+      util -= 1000000
+    elif theirs == 3 and empty == 1:
+      util -= 1000
+    elif theirs == 2 and empty == 2:
+      util -= 30
+    return util
+  return one_side(own, opp) - one_side(opp, own)
+
+
+# window scores indexed by own * 5 + opp
+WINDOW_SCORES = [window_score(code // 5, code % 5) for code in range(25)]
+
+
+# Keeps per-window piece counts for one player's perspective so that
+# AlphaBetaPlayer.utility can be read in O(1) and updated per move
+class IncrementalEvaluator:
+  def __init__(self, piece, game):
+    self.own = piece - 1
+    self.center = (COLS // 2) * H1
+    self.windows = [0] * len(WINDOWS)  # own * 5 + opp for each window
+    self.score = 0
+    for player in (0, 1):
+      mask = game.masks[player]
+      for pos in range(COLS * H1):
+        if mask >> pos & 1:
+          self.add(pos, player)
+
+  # accounts for a piece of `player` (0 or 1) placed at bitboard position pos
+  def add(self, pos, player):
+    windows = self.windows
+    step = 5 if player == self.own else 1
+    delta = 0
+    for w in CELL_WINDOWS[pos]:
+      code = windows[w]
+      windows[w] = code + step
+      delta += WINDOW_SCORES[code + step] - WINDOW_SCORES[code]
+    if player == self.own and self.center <= pos < self.center + ROWS:
+      delta += 5
+    self.score += delta
+
+  # reverts add(pos, player)
+  def remove(self, pos, player):
+    windows = self.windows
+    step = 5 if player == self.own else 1
+    delta = 0
+    for w in CELL_WINDOWS[pos]:
+      code = windows[w]
+      windows[w] = code - step
+      delta += WINDOW_SCORES[code - step] - WINDOW_SCORES[code]
+    if player == self.own and self.center <= pos < self.center + ROWS:
+      delta -= 5
+    self.score += delta
+
+
+# raised inside the search when a time-limited move runs past its deadline
+class SearchTimeout(Exception):
+  pass
+
 
 # Represents an AI agent which uses minimax and alpha-beta pruning to play
 class AlphaBetaPlayer(Player):
-  def __init__(self, piece, depth=7):
+  def __init__(self, piece, depth=7, time_limit=None, tt_size=1 << 20, tt_policy="depth", book=None,
+               move_ordering=True, pvs=True):
         super().__init__(piece)
         self.piece = piece 
         self.depth = depth
+        # when set, depth is ignored and the search deepens until time_limit seconds pass
+        self.time_limit = time_limit
+        self.deadline = None
+        self.depth_reached = 0
+        # kept across get_move calls so later moves reuse earlier searches
+        self.table = TranspositionTable(tt_size, tt_policy)
         self.opponent = 1 if piece == 2 else 2
         self.WINDOW_LENGTH = 4
+        self.nodes = 0
+        self.run_time = 0
+        self.evaluator = None
+        # opening book (OpeningBook or path) consulted before searching
+        self.book = load_book(book)
+        # move_ordering tries the table move, killer moves and then history order;
+        # pvs searches every move after the first with a null window
+        self.move_ordering = move_ordering
+        self.pvs = pvs
+        self.killers = [[None, None] for _ in range(ROWS * COLS + 1)]  # two per ply (stones placed)
+        self.history = [[0] * (COLS * H1) for _ in range(2)]  # cutoff credit per player and cell
+        self.iteration_nodes = []  # nodes searched by each completed depth
 
   # returns the next move
   def get_move(self, game, events):
-    score, col = self.alphaBeta(game, self.depth, float('-inf'), float('inf'), True)
+    self.nodes = 0
+    if self.book is not None:
+      col = self.book.get_move(game)
+      if col is not None:
+        self.depth_reached = 0
+        self.iteration_nodes = []
+        self.run_time = 0
+        return col
+    # search runs in place on a single bitboard using play_move/undo_move
+    board = Connect4Bitboard.from_game(game)
+    self.evaluator = IncrementalEvaluator(self.piece, board)
+    self.killers = [[None, None] for _ in self.killers]
+    # older cutoffs count for less in the new position
+    self.history = [[h >> 2 for h in player] for player in self.history]
+    self.iteration_nodes = []
+    start = time.perf_counter()
+    if self.time_limit is None:
+      score, col = self.alphaBeta(board, self.depth, float('-inf'), float('inf'), True)
+      self.depth_reached = self.depth
+      self.iteration_nodes.append(self.nodes)
+    else:
+      col = self.iterative_deepening(board, start + self.time_limit)
+    self.run_time = time.perf_counter() - start
     return col
+
+  # deepens one ply at a time until the deadline and returns the last completed best move
+  def iterative_deepening(self, board, deadline):
+    valid_moves = board.get_valid_moves()
+    if not valid_moves:
+      return None
+    col = min(valid_moves, key=lambda c: abs(c - board.COLS // 2))
+    self.depth_reached = 0
+    self.deadline = deadline
+    try:
+      for depth in range(1, board.MAX - board.pieces_placed + 1):
+        # the previous iteration's best move is tried first through the transposition table
+        nodes = self.nodes
+        score, col = self.alphaBeta(board, depth, float('-inf'), float('inf'), True)
+        self.depth_reached = depth
+        self.iteration_nodes.append(self.nodes - nodes)
+    except SearchTimeout:
+      pass
+    finally:
+      self.deadline = None
+    return col
+
+  # nodes searched per second during the last get_move
+  def nodes_per_second(self):
+    return self.nodes / self.run_time if self.run_time > 0 else 0.0
+
+  # effective branching factor b of the last search, where b ** depth is the number of nodes searched
+  def effective_branching_factor(self):
+    if not self.iteration_nodes or self.depth_reached == 0:
+      return 0.0
+    return self.iteration_nodes[-1] ** (1 / self.depth_reached)
   
   # runs minimax with alpha-beta pruning
   def alphaBeta(self, game, depth, alpha, beta, maxPlayer):
+    self.nodes += 1
+    if self.deadline is not None and self.nodes & 255 == 0 and time.perf_counter() > self.deadline:
+      raise SearchTimeout()
     valid_moves = game.get_valid_moves()
 
     if depth == 0 or not valid_moves or game.game_over:
-      for col in game.get_valid_moves():
-        
-        temp_game = copy.copy(game)
-        temp_game.board = [row[:] for row in game.board]
-        row = temp_game.get_next_open_row(col)
-        temp_game.board[row][col] = self.piece
-        temp_game.pieces_placed += 1
-
-
-        if temp_game.check_win(row, col):
-            return 1000000, None
-        temp_game.board[row][col] = self.opponent
-        if temp_game.check_win(row, col):
-            return -1000000, None
-      return self.utility(game), None
+      if not game.game_over:
+        # a win for the side to move, or two threats it cannot both block, decides the leaf
+        winner = forced_winner(analyze(game.masks), game.turn)
+        if winner is not None:
+          return (1000000 if winner == self.piece - 1 else -1000000), None
+      return self.evaluate(game), None
+
+    alpha_orig, beta_orig = alpha, beta
+    # a position and its mirror image share one entry, stored in the canonical orientation
+    key, mirrored = canonical_hash(game)
+    entry = self.table.probe(key)
+    if entry is not None:
+      _, entry_depth, flag, value, tt_move = entry
+      if mirrored and tt_move is not None:
+        tt_move = mirror_move(tt_move)
+      if entry_depth >= depth:
+        if flag == EXACT:
+          return value, tt_move
+        if flag == LOWER:
+          alpha = max(alpha, value)
+        else:
+          beta = min(beta, value)
+        if alpha >= beta:
+          return value, tt_move
+    else:
+      tt_move = None
+    valid_moves = self.order_moves(game, valid_moves, tt_move)
     
     # maximizing player
     if maxPlayer:
       max_util = float('-inf')
-      move = random.choice(valid_moves)
-      top_moves = []
-
-      for col in valid_moves:
-        temp_game = copy.copy(game)
-        temp_game.board = [row[:] for row in game.board]
-        row = temp_game.get_next_open_row(col)
-        temp_game.board[row][col] = self.piece
-        temp_game.pieces_placed += 1
-
-        if temp_game.check_win(row, col) or temp_game.pieces_placed == temp_game.MAX:
-          temp_game.game_over = True
-        
-        util, best_col = self.alphaBeta(temp_game, depth - 1, alpha, beta, False)
+      move = valid_moves[0]
+
+      for i, col in enumerate(valid_moves):
+        self.make_move(game, col)
+        if i == 0 or not self.pvs:
+          util, best_col = self.alphaBeta(game, depth - 1, alpha, beta, False)
+        else:
+          # prove the move is no better than alpha, and search it fully only if that fails
+          util, best_col = self.alphaBeta(game, depth - 1, alpha, alpha + 1, False)
+          if alpha < util < beta:
+            util, best_col = self.alphaBeta(game, depth - 1, alpha, beta, False)
+        self.unmake_move(game)
 
+        # only a strictly better move replaces the best one: a later move that fails
+        # low returns an upper bound, so a value equal to the best is no real tie
         if util > max_util:
           max_util = util
-          best_moves = [col]
-        elif util == max_util:
-          best_moves.append(col)
+          move = col
         
         alpha = max(alpha, max_util)
 
         if beta <= alpha:
+          self.record_cutoff(game, col, depth)
           break
-      best_moves.sort(key=lambda col: abs(col - game.COLS // 2))
-      return max_util, best_moves[0]
+      self.store(game, depth, max_util, alpha_orig, beta_orig, move)
+      return max_util, move
     
     # minimizing player
     else:
       min_util = float('inf')
-      move = random.choice(valid_moves)
-
-      for col in valid_moves:
-        temp_game = copy.copy(game)
-        temp_game.board = [row[:] for row in game.board]
-        row = temp_game.get_next_open_row(col)
-        temp_game.board[row][col] = self.opponent
-        temp_game.pieces_placed += 1
+      move = valid_moves[0]
 
-        if temp_game.check_win(row, col) or temp_game.pieces_placed == temp_game.MAX:
-          temp_game.game_over = True
-        
-        util, best_col = self.alphaBeta(temp_game, depth - 1, alpha, beta, True)
+      for i, col in enumerate(valid_moves):
+        self.make_move(game, col)
+        if i == 0 or not self.pvs:
+          util, best_col = self.alphaBeta(game, depth - 1, alpha, beta, True)
+        else:
+          util, best_col = self.alphaBeta(game, depth - 1, beta - 1, beta, True)
+          if alpha < util < beta:
+            util, best_col = self.alphaBeta(game, depth - 1, alpha, beta, True)
+        self.unmake_move(game)
 
         if util < min_util:
           min_util = util
@@ -93,10 +268,73 @@ class AlphaBetaPlayer(Player):
         beta = min(beta, min_util)
 
         if beta <= alpha:
+          self.record_cutoff(game, col, depth)
           break
 
+      self.store(game, depth, min_util, alpha_orig, beta_orig, move)
       return min_util, move
 
+  # search order: table move, then this ply's killer moves, then the rest by history score (center first on ties);
+  # among equally scored moves the first one searched is played, so this order also breaks ties
+  def order_moves(self, game, valid_moves, tt_move):
+    heights = game.heights
+    moves = [col for col in CENTER_ORDER if heights[col] < ROWS]
+    if not self.move_ordering:
+      if tt_move in moves:
+        moves.remove(tt_move)
+        moves.insert(0, tt_move)
+      return moves
+    history = self.history[game.turn]
+    moves.sort(key=lambda col: -history[col * H1 + heights[col]])
+    for col in reversed([tt_move] + self.killers[game.pieces_placed]):
+      if col is not None and col in moves:
+        moves.remove(col)
+        moves.insert(0, col)
+    return moves
+
+  # remembers a move that caused a beta cutoff as a killer for this ply and credits its cell in the history table
+  def record_cutoff(self, game, col, depth):
+    if not self.move_ordering:
+      return
+    killers = self.killers[game.pieces_placed]
+    if killers[0] != col:
+      killers[1] = killers[0]
+      killers[0] = col
+    self.history[game.turn][col * H1 + game.heights[col]] += depth * depth
+
+  # plays col on the search board and updates the incremental evaluator
+  def make_move(self, game, col):
+    pos = col * H1 + game.heights[col]
+    player = game.turn
+    game.play_move(col)
+    self.evaluator.add(pos, player)
+
+  # takes back the last move on the search board and in the evaluator
+  def unmake_move(self, game):
+    col = game.undo_move()
+    self.evaluator.remove(col * H1 + game.heights[col], game.turn)
+
+  # same value as utility(game) for the search board, read from the incremental evaluator
+  def evaluate(self, game):
+    if game.game_over:
+      if has_four(game.masks[self.piece - 1]):
+        return 1000000
+      if has_four(game.masks[self.opponent - 1]):
+        return -1000000
+      return 0
+    return self.evaluator.score
+
+  # records a node result in the transposition table with its bound type
+  def store(self, game, depth, util, alpha, beta, move):
+    if util <= alpha:
+      flag = UPPER
+    elif util >= beta:
+      flag = LOWER
+    else:
+      flag = EXACT
+    key, mirrored = canonical_hash(game)
+    self.table.store(key, depth, flag, util, mirror_move(move) if mirrored else move)
+
   # gets the utility of the current game board
   def utility(self, game):
     if game.game_over:
@@ -179,7 +417,22 @@ class AlphaBetaPlayer(Player):
             if game.board[r][c] != 0:
                 if game.check_win(r, c): 
                     return game.board[r][c]
-    return None 
-
+    return None
 
 
+if __name__ == "__main__":
+  # reports search speed and effective branching factor from a few fixed positions,
+  # without and with move ordering and principal-variation search
+  openings = [[], [3, 3], [3, 2, 4, 4, 2], [3, 3, 3, 3, 2, 4, 4]]
+  for moves in openings:
+    game = Connect4Bitboard()
+    for col in moves:
+      game.play_move(col)
+    players = (AlphaBetaPlayer(game.turn + 1, move_ordering=False, pvs=False),
+               AlphaBetaPlayer(game.turn + 1),
+               AlphaBetaPlayer(game.turn + 1, time_limit=1.0))
+    for player in players:
+      col = player.get_move(game, None)
+      print(f"moves={moves} ordering={player.move_ordering} pvs={player.pvs} depth={player.depth_reached} "
+            f"best={col} nodes={player.nodes} ebf={player.effective_branching_factor():.2f} "
+            f"time={player.run_time:.2f}s nps={player.nodes_per_second():.0f}")
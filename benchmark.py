@@ -0,0 +1,322 @@
+"""
+Benchmark suite for the game engines and agents
+
+Measures every component on a fixed set of positions and writes the results as
+JSON, so runs can be compared:
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --baseline baseline.json          # exits 1 on a regression
+    python benchmark.py --only alphabeta mcts --quick
+
+Each metric records its unit and whether higher or lower is better. A metric
+regresses when it is worse than the baseline by more than its group's threshold
+(see THRESHOLDS, or override them all with --threshold).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from bitboard import Connect4Bitboard
+
+# move sequences of the fixed positions: opening, early, middle and late game
+POSITIONS = {
+    "empty": [],
+    "early": [3, 3, 2, 4],
+    "middle": [3, 3, 3, 3, 2, 4, 4, 2, 5, 1],
+    "late": [5, 3, 3, 5, 1, 4, 2, 1, 2, 1, 3, 4, 2, 4, 5, 1, 5, 2, 1, 2],
+}
+
+# allowed relative slowdown per benchmark group before a metric counts as a regression,
+# set just above the run-to-run noise of each group on a busy machine
+THRESHOLDS = {
+    "game": 0.15,
+    "alphabeta": 0.15,
+    "mcts": 0.20,
+    "heuristic": 0.15,
+    "dqn": 0.30,
+}
+
+
+def position(moves, game_class=Connect4Bitboard):
+    game = game_class()
+    for col in moves:
+        game.play_move(col)
+    return game
+
+
+def random_games(count, seed=0):
+    """Move sequences of `count` random games, identical on every run."""
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        game = Connect4Bitboard()
+        moves = []
+        while not game.game_over:
+            col = rng.choice(game.get_valid_moves())
+            game.play_move(col)
+            moves.append(col)
+        games.append(moves)
+    return games
+
+
+def best_time(fn, repeat):
+    """Fastest of `repeat` timed calls of fn, which filters out scheduling noise."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def metric(value, unit, better="higher"):
+    return {"value": value, "unit": unit, "better": better}
+
+
+def bench_game(quick):
+    """play_move (which checks for a win) and check_win throughput of both game implementations."""
+    from connect4 import Connect4Game
+
+    games = random_games(50 if quick else 200)
+    total_moves = sum(len(moves) for moves in games)
+    repeat = 2 if quick else 5
+    results = {}
+    for name, game_class in (("game", Connect4Game), ("bitboard", Connect4Bitboard)):
+        def replay():
+            for moves in games:
+                game = game_class()
+                for col in moves:
+                    game.play_move(col)
+        seconds = best_time(replay, repeat)
+        results[f"game.{name}_play_move_per_s"] = metric(total_moves / seconds, "moves/s")
+
+        # check_win for every piece of the finished games
+        finished = []
+        for moves in games:
+            game = game_class()
+            cells = [game.play_move(col)[1:] for col in moves]
+            finished.append((game, cells))
+
+        def check_all():
+            for game, cells in finished:
+                for row, col in cells:
+                    game.check_win(row, col)
+        seconds = best_time(check_all, repeat)
+        results[f"game.{name}_check_win_per_s"] = metric(total_moves / seconds, "calls/s")
+    return results
+
+
+def bench_alphabeta(quick):
+    """Nodes per second, time to finish each depth from scratch, and the effective branching factor."""
+    from alphaBeta import AlphaBetaPlayer
+
+    depths = range(1, 7 if quick else 9)
+    repeat = 2 if quick else 3
+    results = {}
+    total_nodes = 0
+    total_time = 0.0
+    for depth in depths:
+        depth_time = 0.0
+        depth_nodes = 0
+        for moves in POSITIONS.values():
+            game = position(moves)
+            # a fresh player (and transposition table) per run, keeping the fastest
+            runs = []
+            for _ in range(repeat):
+                player = AlphaBetaPlayer(game.turn + 1, depth=depth)
+                player.get_move(game, None)
+                runs.append((player.run_time, player.nodes))
+            run_time, nodes = min(runs)
+            depth_time += run_time
+            depth_nodes += nodes
+            total_nodes += nodes
+            total_time += run_time
+        results[f"alphabeta.time_to_depth_{depth}_s"] = metric(depth_time, "s", "lower")
+    results["alphabeta.nodes_per_s"] = metric(total_nodes / total_time, "nodes/s")
+    # b with b ** depth equal to the mean node count of the deepest search
+    mean_nodes = depth_nodes / len(POSITIONS)
+    results["alphabeta.effective_branching_factor"] = metric(mean_nodes ** (1 / depth), "", "lower")
+    return results
+
+
+def bench_mcts(quick):
+    """MCTS.search rollouts per second from every position."""
+    from mcts import MCTS, ArrayMCTS, ConnectState
+
+    time_limit = 0.25 if quick else 1.0
+    searches = {
+        "mcts": lambda state: MCTS(state),
+        "array_mcts": lambda state: ArrayMCTS(state, max_nodes=1 << 18),
+        "mcts_leaf_batch_64": lambda state: MCTS(state, leaf_batch=64),
+    }
+    results = {}
+    for name, make in searches.items():
+        rollouts = 0
+        seconds = 0.0
+        for moves in POSITIONS.values():
+            random.seed(0)
+            search = make(ConnectState(position(moves)))
+            search.search(time_limit)
+            rollouts += search.num_rollouts
+            seconds += search.run_time
+        results[f"mcts.{name}_rollouts_per_s"] = metric(rollouts / seconds, "rollouts/s")
+    return results
+
+
+def bench_heuristic(quick):
+    """HeuristicPlayer.evaluate, evaluate_batch and get_move throughput."""
+    from heuristic_player import HeuristicPlayer
+
+    player = HeuristicPlayer(1)
+    boards = []
+    for moves in random_games(50, seed=1):
+        game = Connect4Bitboard()
+        for col in moves[:-1]:
+            game.play_move(col)
+            boards.append([row[:] for row in game.board])
+    repeat = 2 if quick else 5
+    results = {}
+
+    seconds = best_time(lambda: [player.evaluate(board, 1) for board in boards], repeat)
+    results["heuristic.evaluate_per_s"] = metric(len(boards) / seconds, "calls/s")
+
+    stacked = np.array(boards, dtype=np.int8)
+    seconds = best_time(lambda: player.evaluate_batch(stacked, 1), repeat)
+    results["heuristic.evaluate_batch_boards_per_s"] = metric(len(boards) / seconds, "boards/s")
+
+    games = [position(moves) for moves in POSITIONS.values()] * (10 if quick else 50)
+    seconds = best_time(lambda: [player.get_move(game, None) for game in games], repeat)
+    results["heuristic.get_move_per_s"] = metric(len(games) / seconds, "moves/s")
+    return results
+
+
+def bench_dqn(quick):
+    """DQNPlayer.select_moves latency at several batch sizes, using freshly initialised weights."""
+    import torch
+    from dqn import Connect4DQN
+    from dqnPlayer import DQNPlayer
+
+    torch.manual_seed(0)
+    player = DQNPlayer(1, state_dict=Connect4DQN().state_dict())
+    boards = []
+    turns = []
+    for moves in random_games(100, seed=2):
+        game = Connect4Bitboard()
+        for col in moves[:-1]:
+            game.play_move(col)
+            boards.append([row[:] for row in game.board])
+            turns.append(game.turn + 1)
+    boards = np.array(boards, dtype=np.int8)
+    turns = np.array(turns)
+    repeat = 5 if quick else 20
+    results = {}
+    for batch_size in (1, 16, 64, 256):
+        batch = boards[:batch_size], turns[:batch_size]
+        player.select_moves(*batch)  # warm up
+        seconds = best_time(lambda: player.select_moves(*batch), repeat)
+        results[f"dqn.batch_{batch_size}_latency_ms"] = metric(1000 * seconds, "ms", "lower")
+        results[f"dqn.batch_{batch_size}_boards_per_s"] = metric(batch_size / seconds, "boards/s")
+    return results
+
+
+BENCHMARKS = {
+    "game": bench_game,
+    "alphabeta": bench_alphabeta,
+    "mcts": bench_mcts,
+    "heuristic": bench_heuristic,
+    "dqn": bench_dqn,
+}
+
+
+def run_benchmarks(only=None, quick=False):
+    """Run the selected benchmark groups and return the results dict written as JSON."""
+    metrics = {}
+    for name, bench in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        start = time.perf_counter()
+        metrics.update(bench(quick))
+        print(f"{name}: done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": quick,
+        },
+        "metrics": metrics,
+    }
+
+
+def compare(results, baseline, threshold=None):
+    """Rows of (name, baseline, current, relative change, regressed) for metrics in both runs.
+
+    The change is signed so that positive always means better.
+    """
+    rows = []
+    for name, current in results["metrics"].items():
+        if name not in baseline["metrics"]:
+            continue
+        old = baseline["metrics"][name]["value"]
+        new = current["value"]
+        if old == 0:
+            continue
+        change = (new - old) / old
+        if current["better"] == "lower":
+            change = -change
+        limit = threshold if threshold is not None else THRESHOLDS[name.split(".")[0]]
+        rows.append((name, old, new, change, change < -limit))
+    return rows
+
+
+def format_results(results, rows=None):
+    lines = []
+    if rows is None:
+        for name, m in results["metrics"].items():
+            lines.append(f"{name:<44}{m['value']:>14.4g} {m['unit']}")
+        return "\n".join(lines)
+    lines.append(f"{'metric':<44}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        lines.append(f"{name:<44}{old:>14.4g}{new:>14.4g}{change:>+10.1%}{flag}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Connect4 engines and agents.")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmark groups to run")
+    parser.add_argument("--quick", action="store_true", help="shorter runs, for a quick check")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--threshold", type=float,
+                        help="allowed relative slowdown for every metric (default: per group, see THRESHOLDS)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.only, args.quick)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline is None:
+        print(format_results(results))
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.threshold)
+    print(format_results(results, rows))
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
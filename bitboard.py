@@ -0,0 +1,175 @@
+"""
+Bitboard game state for Connect4
+
+This module implements a drop-in replacement for connect4.Connect4Game that stores
+the position as two 64-bit masks (one per player) plus a column height array.
+
+Bit layout: each column uses 7 bits (6 playable rows plus one sentinel bit), so
+the cell at board row r (0 = top, as in Connect4Game) and column c lives at bit
+c * 7 + (5 - r). The sentinel row keeps shifted lines from wrapping between
+columns, which lets win detection run as a handful of shift-and-AND operations.
+A list-of-lists `board` view is kept in step with the masks for the GUI and DQN.
+"""
+
+import random
+
+ROWS = 6
+COLS = 7
+H1 = ROWS + 1  # bits per column, including the sentinel
+
+BOTTOM_MASK = sum(1 << (c * H1) for c in range(COLS))
+BOARD_MASK = BOTTOM_MASK * ((1 << ROWS) - 1)
+
+# shift amounts for vertical, horizontal, and the two diagonals
+DIRECTIONS = (1, H1, H1 + 1, H1 - 1)
+
+# Zobrist keys per (player, bit); seeded so hashes are stable between runs
+_zobrist_rng = random.Random(0xC4)
+ZOBRIST = [[_zobrist_rng.getrandbits(64) for _ in range(COLS * H1)] for _ in range(2)]
+
+# bit position of the mirror image (columns reversed) of every bit position
+MIRROR_POS = [(COLS - 1 - pos // H1) * H1 + pos % H1 for pos in range(COLS * H1)]
+
+
+def cell_bit(row, col):
+    """Return the single-bit mask for board cell (row, col)."""
+    return 1 << (col * H1 + ROWS - 1 - row)
+
+
+def position_key(masks, mover):
+    """Unique integer key (< 2**49) of a position, given both masks and the index of the side to move.
+
+    Adding the bottom row to the occupied mask sets one marker bit above each
+    column's stack, so the mover's stones plus that sum identify the position.
+    """
+    return masks[mover] + (masks[0] | masks[1]) + BOTTOM_MASK
+
+
+def has_four(mask):
+    """Return True if the mask contains four aligned pieces anywhere."""
+    for d in DIRECTIONS:
+        m = mask & (mask >> d)
+        if m & (m >> 2 * d):
+            return True
+    return False
+
+
+def wins_at(mask, bit):
+    """Return True if the piece at `bit` is part of four aligned pieces in `mask`."""
+    for d in DIRECTIONS:
+        m = mask & (mask >> d)
+        m &= m >> 2 * d
+        if m and m & (bit | bit >> d | bit >> 2 * d | bit >> 3 * d):
+            return True
+    return False
+
+
+class Connect4Bitboard:
+    """Connect4 game state with the same interface as Connect4Game."""
+
+    ROWS = ROWS
+    COLS = COLS
+
+    def __init__(self):
+        self.masks = [0, 0]
+        self.heights = [0] * COLS
+        self._board = [[0] * COLS for _ in range(ROWS)]
+        self.game_over = False
+        self.turn = 0
+        self.MAX = ROWS * COLS
+        self.pieces_placed = 0
+        self.history = []
+        self.hash = 0
+        # Zobrist hash of the mirrored position, for symmetry-aware caches
+        self.mirror_hash = 0
+
+    @classmethod
+    def from_game(cls, game):
+        """Build a bitboard from any object exposing a 6x7 `board`, `turn` and `game_over`."""
+        state = cls()
+        for r in range(ROWS - 1, -1, -1):
+            for c in range(COLS):
+                piece = game.board[r][c]
+                if piece:
+                    state.masks[piece - 1] |= cell_bit(r, c)
+                    pos = c * H1 + ROWS - 1 - r
+                    state.hash ^= ZOBRIST[piece - 1][pos]
+                    state.mirror_hash ^= ZOBRIST[piece - 1][MIRROR_POS[pos]]
+                    state._board[r][c] = piece
+                    state.heights[c] += 1
+                    state.pieces_placed += 1
+        state.turn = game.turn
+        state.game_over = game.game_over
+        return state
+
+    @property
+    def board(self):
+        """6x7 list-of-lists view of the position (row 0 is the top row).
+
+        The view is kept in sync by play_move/undo_move and must not be mutated.
+        """
+        return self._board
+
+    def is_valid_move(self, col):
+        return self.heights[col] < ROWS
+
+    def get_next_open_row(self, col):
+        if col >= COLS or col < 0:
+            raise Exception("Invalid move, column:", col, self.board)
+        if self.heights[col] < ROWS:
+            return ROWS - 1 - self.heights[col]
+
+    def get_valid_moves(self):
+        heights = self.heights
+        return [c for c in range(COLS) if heights[c] < ROWS]
+
+    def play_move(self, col):
+        row = self.get_next_open_row(col)
+        if row is None:
+            raise Exception("Invalid move, row:", row, col)
+
+        pos = col * H1 + self.heights[col]
+        bit = 1 << pos
+        player = self.turn
+        self.masks[player] |= bit
+        self.hash ^= ZOBRIST[player][pos]
+        self.mirror_hash ^= ZOBRIST[player][MIRROR_POS[pos]]
+        self._board[row][col] = player + 1
+        self.heights[col] += 1
+        self.pieces_placed += 1
+        self.history.append(col)
+        self.turn = (1 + player) % 2
+        if wins_at(self.masks[player], bit):
+            self.game_over = True
+            self.turn = player
+        if self.pieces_placed == self.MAX:
+            self.game_over = True
+            self.turn = -1
+        return self.board, row, col
+
+    def undo_move(self):
+        """Take back the last move played with play_move."""
+        col = self.history.pop()
+        self.heights[col] -= 1
+        self.pieces_placed -= 1
+        # moves alternate from player 0, so the mover is fixed by the ply count
+        player = self.pieces_placed % 2
+        pos = col * H1 + self.heights[col]
+        self.masks[player] &= ~(1 << pos)
+        self.hash ^= ZOBRIST[player][pos]
+        self.mirror_hash ^= ZOBRIST[player][MIRROR_POS[pos]]
+        self._board[ROWS - 1 - self.heights[col]][col] = 0
+        self.turn = player
+        self.game_over = False
+        return col
+
+    def key(self):
+        """position_key of the current position (the side to move follows from the ply count)."""
+        return position_key(self.masks, self.pieces_placed % 2)
+
+    def check_win(self, row, col):
+        bit = cell_bit(row, col)
+        for mask in self.masks:
+            if mask & bit:
+                return wins_at(mask, bit)
+        return False
@@ -0,0 +1,119 @@
+"""
+Checkpointing and opponent snapshots for DQN training
+
+AsyncCheckpointer writes model checkpoints from a background thread so the
+training loop never waits on disk. Each file is written to a temporary name
+and moved into place with os.replace, so a killed job never leaves a partial
+checkpoint behind, and only the newest `keep` numbered checkpoints are kept.
+
+OpponentPool keeps past policy weights in memory for self-play, so refreshing
+the opponent does not round-trip through a file.
+"""
+
+import os
+import queue
+import random
+import threading
+from collections import deque
+
+import torch
+
+from dqnPlayer import DQNPlayer
+
+
+def snapshot(state_dict):
+    """Detached CPU copy of a state_dict that later training steps cannot change."""
+    return {name: tensor.detach().to("cpu", copy=True) for name, tensor in state_dict.items()}
+
+
+class AsyncCheckpointer:
+    """Saves state_dicts every `interval` steps on a background thread.
+
+    Files are named {prefix}_{step}.pth inside `directory`. When latest_path is
+    set, the newest checkpoint is also written there (e.g. "checkpoint.pth").
+    If a write fails, the writer stops and the error is raised by the next
+    save() or by close().
+    """
+
+    def __init__(self, directory="checkpoints", interval=100, keep=5, prefix="checkpoint",
+                 latest_path="checkpoint.pth"):
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.prefix = prefix
+        self.latest_path = latest_path
+        self.saved = deque()
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def maybe_save(self, step, state_dict):
+        """Queue a checkpoint if step falls on the save interval."""
+        if step % self.interval == 0:
+            self.save(step, state_dict)
+
+    def save(self, step, state_dict):
+        """Queue a copy of state_dict to be written as the checkpoint for step."""
+        self._raise_error()
+        self._queue.put((step, snapshot(state_dict)))
+
+    def close(self):
+        """Finish all queued writes and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._save(*item)
+            except Exception as exc:
+                # kept for the training thread, which re-raises it
+                self.error = exc
+                return
+
+    def _save(self, step, state_dict):
+        path = os.path.join(self.directory, f"{self.prefix}_{step}.pth")
+        self._write(path, state_dict)
+        if self.latest_path is not None:
+            self._write(self.latest_path, state_dict)
+        self.saved.append(path)
+        while len(self.saved) > self.keep:
+            old = self.saved.popleft()
+            if os.path.exists(old):
+                os.remove(old)
+
+    def _write(self, path, state_dict):
+        tmp_path = path + ".tmp"
+        torch.save(state_dict, tmp_path)
+        os.replace(tmp_path, path)
+
+
+class OpponentPool:
+    """Bounded pool of past policy weights kept in memory for self-play opponents."""
+
+    def __init__(self, size=10):
+        self.snapshots = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def add(self, state_dict):
+        self.snapshots.append(snapshot(state_dict))
+
+    def latest(self, piece):
+        """DQNPlayer with the most recent weights."""
+        return DQNPlayer(piece, state_dict=self.snapshots[-1])
+
+    def sample(self, piece):
+        """DQNPlayer with weights drawn uniformly from the pool."""
+        return DQNPlayer(piece, state_dict=random.choice(self.snapshots))
@@ -31,30 +31,10 @@ game_gui.run()
 
 '''
 # Uncomment to run many games of the specified agents (no gui)
+# Probably most useful for comparisons. From the command line the same is
+#   python tournament.py heuristic alphabeta --games 10000 --workers 8
+from tournament import run_tournament, format_results
 
-player1 = HeuristicPlayer(1)
-player2 = AlphaBetaPlayer(2)
-
-# Probably most useful for comparisons.
-players = [player1,player2]
-player1_wins = 0
-player2_wins = 0
-
-for i in range(10001):
-    game = Connect4Game()
-    while not game.game_over:
-        move = players[game.turn].get_move(game, None)
-        game.play_move(move)
-
-    
-    if game.turn == 0:
-        player1_wins += 1
-    elif game.turn == 1:
-        player2_wins += 1
-    if i % 1 == 0:
-        print("total:", i)
-        print("player 1 wins:", player1_wins)
-        print("player 2 wins:", player2_wins)
-        print("ties:", i - player2_wins - player1_wins)
-        print("\n\n")
-'''
\ No newline at end of file
+results = run_tournament(["heuristic", "alphabeta"], games=10000, workers=8)
+print(format_results(results))
+'''
@@ -1,7 +1,13 @@
+import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
 ROWS, COLS = 6, 7
+# input encoding the weights were trained on (dqnPlayer.encode_boards); saved with
+# every state_dict so that a model is always fed the input it was trained on
+ENCODING_VERSION = 1
+# weights saved before the version was recorded, which were trained on all-zero input
+LEGACY_ENCODING = 0
 
 class Connect4DQN(nn.Module):
     def __init__(self):
@@ -14,6 +20,17 @@ class Connect4DQN(nn.Module):
             nn.ReLU(),
             nn.Linear(64, COLS)
         )
+        self.register_buffer("encoding_version", torch.tensor(ENCODING_VERSION))
 
     def forward(self, x):
-        return self.net(x)
\ No newline at end of file
+        return self.net(x)
+
+
+def encoding_version(state_dict, source="state_dict"):
+    """Input encoding a state_dict was trained on: ENCODING_VERSION, or LEGACY_ENCODING when unversioned."""
+    version = state_dict.get("encoding_version")
+    if version is None:
+        return LEGACY_ENCODING
+    if int(version) not in (LEGACY_ENCODING, ENCODING_VERSION):
+        raise ValueError(f"{source} uses unknown board encoding version {int(version)}")
+    return int(version)
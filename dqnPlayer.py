@@ -1,35 +1,65 @@
+import warnings
+
 import numpy as np
 import torch
-from dqn import Connect4DQN
+from dqn import LEGACY_ENCODING, Connect4DQN, encoding_version
 from player import Player
 
 
+def encode_boards(boards, turns):
+    """Encode (n, 6, 7) boards as a (n, 1, 6, 7) tensor from the view of each turn's piece.
+
+    Cells holding turns[i] become 1, the opponent's pieces -1 and empty cells 0.
+    """
+    boards = np.asarray(boards)
+    turns = np.asarray(turns).reshape(-1, 1, 1)
+    encoded = (boards == turns).astype(np.float32) - (boards == 3 - turns)
+    return torch.from_numpy(encoded).unsqueeze(1)
+
+
 class DQNPlayer(Player):
-    def __init__(self, piece, model_path):
+    # weights come from model_path, or from an in-memory state_dict when one is given
+    def __init__(self, piece, model_path=None, state_dict=None):
         self.piece = piece
         self.policy_net = Connect4DQN()  # Define same architecture used during training
-        self.policy_net.load_state_dict(torch.load(model_path))
+        if state_dict is None:
+            state_dict = torch.load(model_path)
+        self.encoding = encoding_version(state_dict, model_path or "state_dict")
+        if self.encoding == LEGACY_ENCODING:
+            warnings.warn(f"{model_path or 'state_dict'} was trained before the current board encoding "
+                          "and plays with its all-zero input; retrain it with training.py")
+            state_dict = dict(state_dict, encoding_version=torch.tensor(LEGACY_ENCODING))
+        self.policy_net.load_state_dict(state_dict)
         self.policy_net.eval()  # Inference mode
 
     def get_move(self, game, events):
-        board = game.board  # Assuming game.board is a 2D NumPy array
-        valid_moves = game.get_valid_moves()
-        if not valid_moves:
-            return None
+        return self.get_moves([game])[0]
 
-        # Convert board to tensor from the perspective of self.player_id
-        state_tensor = self.board_to_tensor(board, game.turn + 1)
-        q_values = self.policy_net(state_tensor)[0].detach().clone()
+    def get_moves(self, games):
+        """Choose a move for every game with a single batched forward pass.
 
-        # Mask out invalid moves
-        for c in range(7):
-            if c not in valid_moves:
-                q_values[c] = -float("inf")
+        Games with no valid moves get None.
+        """
+        if not games:
+            return []
+        boards = np.array([game.board for game in games], dtype=np.int8)
+        turns = np.array([game.turn + 1 for game in games])
+        moves = self.select_moves(boards, turns)
+        has_moves = (boards[:, 0, :] == 0).any(axis=1)
+        return [int(move) if ok else None for move, ok in zip(moves, has_moves)]
 
-        return torch.argmax(q_values).item()
+    def select_moves(self, boards, turns):
+        """Greedy valid column for each of the (n, 6, 7) boards, with turns holding the piece to move."""
+        boards = np.asarray(boards)
+        legal = torch.from_numpy(boards[:, 0, :] == 0)
+        with torch.inference_mode():
+            states = encode_boards(boards, turns)
+            if self.encoding == LEGACY_ENCODING:
+                # the input these weights were trained on
+                states = torch.zeros_like(states)
+            q_values = self.policy_net(states)
+            q_values = q_values.masked_fill(~legal, -float("inf"))
+            return q_values.argmax(dim=1).numpy()
 
     def board_to_tensor(self, board, turn):
-        tensor = np.zeros_like(board, dtype=np.float32)
-        tensor[board == turn] = 1
-        tensor[board == (3 - turn)] = -1
-        return torch.tensor(tensor).unsqueeze(0).unsqueeze(0)
\ No newline at end of file
+        return encode_boards([board], [turn])
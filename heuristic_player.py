@@ -14,13 +14,19 @@ The heuristic evaluates:
 
 import random
 import copy
+import numpy as np
 from player import Player
+from opening_book import load_book
+from bitboard import Connect4Bitboard
+from threats import columns, playable_threats
 
 class HeuristicPlayer(Player):
     """A Connect Four player using an optimized heuristic for board evaluation."""
     
-    def __init__(self, piece):
+    def __init__(self, piece, book=None):
         super().__init__(piece)
+        # optional OpeningBook (or path) consulted before evaluating moves
+        self.book = load_book(book)
         self.winning_lines = self._generate_winning_lines()
         self.weights = {
             'my_four': 1000000,    # Immediate win
@@ -31,6 +37,14 @@ class HeuristicPlayer(Player):
             'opp_two': -300,       # Opponent's two
             'center_bonus': 8      # Center control
         }
+        # (69, 4) flat cell indices (r * 7 + c) of every winning line
+        self.line_index = np.array([[r * 7 + c for r, c in line] for line in self.winning_lines])
+        # pattern_scores[my_count, opp_count] is the score of one line
+        self.pattern_scores = np.array([[self._score_pattern(m, o, 4 - m - o) if m + o <= 4 else 0
+                                         for o in range(5)] for m in range(5)], dtype=np.int64)
+        # per-cell center bonus for the player's own pieces
+        self.center_weights = np.array([max(self.weights['center_bonus'] - abs(c - 3), 0)
+                                        for r in range(6) for c in range(7)], dtype=np.int64)
 
     def _generate_winning_lines(self):
         """Generate all possible winning lines on a 6x7 board."""
@@ -63,35 +77,91 @@ class HeuristicPlayer(Player):
 
     def evaluate(self, board, player):
         """Score the board state based on heuristic weights."""
-        opponent = 3 - player
-        score = 0
-        for line in self.winning_lines:
-            my_count = sum(1 for r, c in line if board[r][c] == player)
-            opp_count = sum(1 for r, c in line if board[r][c] == opponent)
-            empty_count = 4 - my_count - opp_count
-            score += self._score_pattern(my_count, opp_count, empty_count)
+        return int(self.evaluate_batch([board], player)[0])
+
+    def evaluate_batch(self, boards, player):
+        """Score a stack of boards (any array-like of shape (n, 6, 7)) for player in one pass."""
+        flat = np.asarray(boards).reshape(-1, 42)
+        my_count, opp_count = self._line_counts(flat, player)
+        scores = self.pattern_scores[my_count, opp_count].sum(axis=1)
         # Center bonus: score only for player's pieces
-        for r in range(6):
-            for c in range(7):
-                if board[r][c] == player:
-                    score += max(self.weights['center_bonus'] - abs(c - 3), 0)
-        return score
+        scores += ((flat == player) * self.center_weights).sum(axis=1)
+        return scores
+
+    def _line_counts(self, flat, player):
+        """Per-line piece counts for player and opponent on (n, 42) flattened boards."""
+        cells = flat[:, self.line_index]
+        return (cells == player).sum(axis=2), (cells == 3 - player).sum(axis=2)
 
     def get_move(self, game, events):
         """Choose the best move based on immediate board evaluation."""
+        if self.book is not None:
+            move = self.book.get_move(game)
+            if move is not None:
+                return move
         valid_moves = game.get_valid_moves()
         if not valid_moves:
             return None
+        # Build every candidate board from one array copy instead of copying the game
+        base = np.array(game.board, dtype=np.int8)
+        piece = game.turn + 1
+        boards = np.repeat(base[None], len(valid_moves), axis=0)
+        for i, col in enumerate(valid_moves):
+            row = np.count_nonzero(base[:, col] == 0) - 1
+            boards[i, row, col] = piece
+        flat = boards.reshape(len(valid_moves), 42)
+        scores = self.evaluate_batch(flat, self.piece)
+        # A move that completes four is scored as an immediate win, except when it
+        # fills the board (the game then reports a draw, as in play_move)
+        if piece == self.piece and game.pieces_placed + 1 < game.MAX:
+            masks = getattr(game, "masks", None) or Connect4Bitboard.from_game(game).masks
+            wins = set(columns(playable_threats(masks, piece - 1)))
+            for i, col in enumerate(valid_moves):
+                if col in wins:
+                    scores[i] = self.weights['my_four']
+        best_score = scores.max()
+        best_moves = [col for col, score in zip(valid_moves, scores) if score == best_score]
+        return min(best_moves, key=lambda col: abs(col - 3))
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: moves/second of get_move against the previous deepcopy-per-candidate path
+    import time
+
+    def get_move_deepcopy(player, game):
         best_score = -float('inf')
         best_moves = []
-        for col in valid_moves:
+        for col in game.get_valid_moves():
             temp_game = copy.deepcopy(game)
             temp_game.play_move(col)
-            score = (self.weights['my_four'] if (temp_game.game_over and temp_game.turn == self.piece - 1)
-                     else self.evaluate(temp_game.board, self.piece))
+            score = (player.weights['my_four'] if (temp_game.game_over and temp_game.turn == player.piece - 1)
+                     else player.evaluate(temp_game.board, player.piece))
             if score > best_score:
                 best_score = score
                 best_moves = [col]
             elif score == best_score:
                 best_moves.append(col)
-        return min(best_moves, key=lambda col: abs(col - 3))
\ No newline at end of file
+        return min(best_moves, key=lambda col: abs(col - 3))
+
+    random.seed(0)
+    positions = []
+    while len(positions) < 300:
+        game = Connect4Bitboard()
+        for _ in range(random.randint(0, 30)):
+            game.play_move(random.choice(game.get_valid_moves()))
+            if game.game_over:
+                break
+        if not game.game_over:
+            positions.append(game)
+
+    players = {1: HeuristicPlayer(1), 2: HeuristicPlayer(2)}
+    for name, move_fn in (("deepcopy", lambda p, g: get_move_deepcopy(p, g)),
+                          ("batched", lambda p, g: p.get_move(g, None))):
+        start = time.perf_counter()
+        moves = [move_fn(players[g.turn + 1], g) for g in positions]
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(positions) / elapsed:.0f} moves/s")
+        if name == "deepcopy":
+            reference = moves
+        else:
+            print("same moves:", moves == reference)
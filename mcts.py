@@ -1,26 +1,66 @@
 import random
 import time
 import math
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
 
+import numpy as np
+
+from bitboard import H1, has_four, wins_at
+from rollout import playout, batch_playout
+from opening_book import load_book
+
+EXPLORE = math.sqrt(2)
+
 class ConnectState:
     def __init__(self, game=None):
         self.board = [row[:] for row in game.board] if game else [[0]*7 for _ in range(6)]
         self.turn = game.turn if game else 0
         self.game_over_flag = game.game_over if game else False
         self.pieces_placed = game.pieces_placed if game else 0
+        # bitboard copy of the position for the rollout engine
+        self.masks = [0, 0]
+        self.heights = [0] * 7
+        for r in range(5, -1, -1):
+            for c in range(7):
+                if self.board[r][c]:
+                    self.masks[self.board[r][c] - 1] |= 1 << (c * H1 + self.heights[c])
+                    self.heights[c] += 1
+        # index of the winning player, -1 for a draw, None while the game is running
+        self.winner = None
+        if self.game_over_flag:
+            self.winner = next((p for p in (0, 1) if has_four(self.masks[p])), -1)
+
+    # Cheap clone: copies the board rows instead of deep-copying the whole object
+    def copy(self):
+        state = ConnectState.__new__(ConnectState)
+        state.board = [row[:] for row in self.board]
+        state.turn = self.turn
+        state.game_over_flag = self.game_over_flag
+        state.pieces_placed = self.pieces_placed
+        state.masks = self.masks[:]
+        state.heights = self.heights[:]
+        state.winner = self.winner
+        return state
 
     def move(self, col):
         if self.game_over_flag:
             return
-        for row in range(5, -1, -1):
-            if self.board[row][col] == 0:
-                self.board[row][col] = self.turn + 1
-                self.turn = (self.turn + 1) % 2
-                self.pieces_placed += 1
-                self.game_over_flag = self.check_win(row, col) or self.pieces_placed == 42
-                return
-        raise Exception(f"Invalid move in column {col}")
+        if self.heights[col] == 6:
+            raise Exception(f"Invalid move in column {col}")
+        player = self.turn
+        bit = 1 << (col * H1 + self.heights[col])
+        self.board[5 - self.heights[col]][col] = player + 1
+        self.masks[player] |= bit
+        self.heights[col] += 1
+        self.turn = (player + 1) % 2
+        self.pieces_placed += 1
+        if wins_at(self.masks[player], bit):
+            self.winner = player
+        elif self.pieces_placed == 42:
+            self.winner = -1
+        self.game_over_flag = self.winner is not None
 
     def check_win(self, row, col):
         player = self.board[row][col]
@@ -52,28 +92,43 @@ class Node:
         for child in children:
             self.children[child.move] = child
 
-    def value(self, explore=math.sqrt(2)):
+    def value(self, explore=EXPLORE):
         if self.N == 0:
             return float('inf') if explore > 0 else 0
         return self.Q / self.N + explore * math.sqrt(math.log(self.parent.N) / self.N)
 
 
 class MCTS:
-    def __init__(self, state):
-        self.root_state = deepcopy(state)
+    # leaf_batch is the number of rollouts played from each selected leaf
+    # rollout_policy is "random" or "tactical" (see rollout.py)
+    def __init__(self, state, leaf_batch=1, rollout_policy="random"):
+        self.root_state = state.copy()
         self.root = Node(None, None)
+        self.leaf_batch = leaf_batch
+        self.rollout_policy = rollout_policy
+        # drawn from `random` so seeding that module also fixes batched rollouts
+        self.rng = np.random.default_rng(random.getrandbits(64))
         self.run_time = 0
         self.num_rollouts = 0
 
     # Selects a node to be used as a move
     def select_node(self):
         node = self.root
-        state = deepcopy(self.root_state)
+        state = self.root_state.copy()
 
         while node.children:
-            values = [n.value() for n in node.children.values()]
-            max_val = max(values)
-            best = [n for n in node.children.values() if n.value() == max_val]
+            # single pass over the children, with log(N) computed once per parent
+            log_n = math.log(node.N) if node.N else 0.0
+            best = []
+            max_val = -float('inf')
+            for child in node.children.values():
+                n = child.N
+                val = float('inf') if n == 0 else child.Q / n + EXPLORE * math.sqrt(log_n / n)
+                if val > max_val:
+                    max_val = val
+                    best = [child]
+                elif val == max_val:
+                    best.append(child)
             node = random.choice(best)
             state.move(node.move)
             if node.N == 0:
@@ -94,15 +149,25 @@ class MCTS:
         node.add_children(children)
 
     # Simulates future moves of entire game from given state when game is not over
+    # Returns the winning player's index, or -1 for a draw; state is left unchanged
     def roll_out(self, state):
-        while not state.game_over_flag:
-            moves = [c for c in range(7) if state.board[0][c] == 0]
-            state.move(random.choice(moves))
-        for r in range(6):
-            for c in range(7):
-                if state.board[r][c] != 0 and state.check_win(r, c):
-                    return state.board[r][c] - 1
-        return -1 if state.pieces_placed == 42 else None  # Draw if full
+        if state.winner is not None:
+            return state.winner
+        return playout(state.masks, state.heights, state.turn, self.rollout_policy)
+
+    # Plays k rollouts from state and returns [player 0 wins, player 1 wins, draws]
+    # Random rollouts run as one vectorized batch
+    def roll_out_many(self, state, k):
+        if state.winner is not None:
+            counts = [0, 0, 0]
+            counts[state.winner] = k
+            return counts
+        if self.rollout_policy == "random":
+            return batch_playout(state.masks, state.heights, state.turn, k, self.rng)
+        counts = [0, 0, 0]
+        for _ in range(k):
+            counts[self.roll_out(state)] += 1
+        return counts
 
     # Propagates the winner of simulated game through all ancestors of selected node
     def back_propagate(self, node, player, outcome):
@@ -117,6 +182,16 @@ class MCTS:
             reward = 1 - reward if outcome != -1 else 0.5
             node = node.parent
 
+    # Propagates the aggregate result of a batch of rollouts, counts as returned by roll_out_many
+    def back_propagate_counts(self, node, player, counts):
+        total = sum(counts)
+        reward = counts[player] + 0.5 * counts[2]
+        while node is not None:
+            node.N += total
+            node.Q += reward
+            reward = total - reward
+            node = node.parent
+
     # Perfoms above functions for a specified time (10-15 seconds is ideal)
     # For sake of efficiency for project, use 1 seconds
     def search(self, time_limit):
@@ -125,9 +200,15 @@ class MCTS:
 
         while time.process_time() - start < time_limit:
             node, state = self.select_node()
-            outcome = self.roll_out(state)
-            self.back_propagate(node, (state.turn + 1) % 2, outcome)
-            rollouts += 1
+            # rewards are from the view of the player who moved into the leaf
+            player = (state.turn + 1) % 2
+            if self.leaf_batch == 1:
+                outcome = self.roll_out(state)
+                self.back_propagate(node, player, outcome)
+            else:
+                counts = self.roll_out_many(state, self.leaf_batch)
+                self.back_propagate_counts(node, player, counts)
+            rollouts += self.leaf_batch
 
         self.run_time = time.process_time() - start
         self.num_rollouts = rollouts
@@ -140,26 +221,311 @@ class MCTS:
         best_nodes = [n for n in self.root.children.values() if n.N == max_N]
         return random.choice(best_nodes).move
 
+    # Visit counts of the root's children, keyed by move
+    def root_visits(self):
+        return {move: n.N for move, n in self.root.children.items()}
+
     # If a child node exists for a given move then go there
     def move(self, move):
         if move in self.root.children:
             self.root_state.move(move)
             self.root = self.root.children[move]
+            # detach from the old tree so it can be freed and backups stop at the new root
+            self.root.parent = None
         else:
             self.root_state.move(move)
             self.root = Node(None, None)
 
 
+# Stores the search tree as parallel preallocated arrays indexed by node id
+# instead of one Node object per position. The children of a node occupy a
+# contiguous block of ids starting at first_child[node].
+class ArrayTree:
+    def __init__(self, max_nodes):
+        self.max_nodes = max_nodes
+        self.N = array('i', [0]) * max_nodes
+        self.Q = array('d', [0.0]) * max_nodes
+        self.parent = array('i', [-1]) * max_nodes
+        self.first_child = array('i', [-1]) * max_nodes
+        self.num_children = array('b', [0]) * max_nodes
+        self.move = array('b', [-1]) * max_nodes
+        self.size = 1  # node 0 is the root
+
+    # Allocates a child block for node, or returns False if the node cap would be exceeded
+    def add_children(self, node, moves):
+        first = self.size
+        if first + len(moves) > self.max_nodes:
+            return False
+        for i, move in enumerate(moves):
+            child = first + i
+            self.N[child] = 0
+            self.Q[child] = 0.0
+            self.parent[child] = node
+            self.first_child[child] = -1
+            self.num_children[child] = 0
+            self.move[child] = move
+        self.first_child[node] = first
+        self.num_children[node] = len(moves)
+        self.size = first + len(moves)
+        return True
+
+    def children(self, node):
+        first = self.first_child[node]
+        return range(first, first + self.num_children[node])
+
+    # Makes node the new root (id 0) and compacts its subtree to the front of the
+    # arrays. Ids are renumbered in their original order, so every id only moves
+    # down and child blocks stay contiguous; the rest of the tree is discarded.
+    def reroot(self, node):
+        subtree = [node]
+        for n in subtree:
+            subtree.extend(self.children(n))
+        subtree.sort()
+        new_id = {old: new for new, old in enumerate(subtree)}
+        for old in subtree:
+            new = new_id[old]
+            self.N[new] = self.N[old]
+            self.Q[new] = self.Q[old]
+            self.parent[new] = new_id.get(self.parent[old], -1)
+            self.first_child[new] = new_id[self.first_child[old]] if self.num_children[old] else -1
+            self.num_children[new] = self.num_children[old]
+            self.move[new] = self.move[old]
+        self.parent[0] = -1
+        self.move[0] = -1
+        self.size = len(subtree)
+
+    def reset(self):
+        self.N[0] = 0
+        self.Q[0] = 0.0
+        self.parent[0] = -1
+        self.first_child[0] = -1
+        self.num_children[0] = 0
+        self.move[0] = -1
+        self.size = 1
+
+
+# MCTS over an ArrayTree. When the node cap is reached the tree stops growing:
+# selection still descends and leaves are still rolled out and backed up, but
+# no new nodes are expanded until move() frees space by rerooting.
+class ArrayMCTS(MCTS):
+    def __init__(self, state, max_nodes=1 << 20, leaf_batch=1, rollout_policy="random"):
+        super().__init__(state, leaf_batch, rollout_policy)
+        self.root = 0
+        self.tree = ArrayTree(max_nodes)
+
+    # Selects a node to be used as a move
+    def select_node(self):
+        tree = self.tree
+        N, Q = tree.N, tree.Q
+        node = 0
+        state = self.root_state.copy()
+
+        while tree.num_children[node]:
+            log_n = math.log(N[node]) if N[node] else 0.0
+            best = []
+            max_val = -float('inf')
+            for child in tree.children(node):
+                n = N[child]
+                val = float('inf') if n == 0 else Q[child] / n + EXPLORE * math.sqrt(log_n / n)
+                if val > max_val:
+                    max_val = val
+                    best = [child]
+                elif val == max_val:
+                    best.append(child)
+            node = random.choice(best)
+            state.move(tree.move[node])
+            if N[node] == 0:
+                return node, state
+
+        if not state.game_over_flag and self.expand(node, state):
+            node = random.choice(tree.children(node))
+            state.move(tree.move[node])
+
+        return node, state
+
+    # Adds all possible moves as children of node; False if the tree is full
+    def expand(self, node, state):
+        moves = [c for c in range(7) if state.board[0][c] == 0]
+        return self.tree.add_children(node, moves)
+
+    # Propagates the winner of simulated game through all ancestors of selected node
+    def back_propagate(self, node, player, outcome):
+        if outcome == -1:
+            reward = 0.5
+        else:
+            reward = 1 if outcome == player else 0
+
+        tree = self.tree
+        while node != -1:
+            tree.N[node] += 1
+            tree.Q[node] += reward
+            reward = 1 - reward if outcome != -1 else 0.5
+            node = tree.parent[node]
+
+    # Propagates the aggregate result of a batch of rollouts, counts as returned by roll_out_many
+    def back_propagate_counts(self, node, player, counts):
+        total = sum(counts)
+        reward = counts[player] + 0.5 * counts[2]
+        tree = self.tree
+        while node != -1:
+            tree.N[node] += total
+            tree.Q[node] += reward
+            reward = total - reward
+            node = tree.parent[node]
+
+    # Finds best move by looking at most visited children nodes
+    def best_move(self):
+        tree = self.tree
+        if not tree.num_children[0]:
+            return random.choice([c for c in range(7) if self.root_state.board[0][c] == 0])
+        max_N = max(tree.N[n] for n in tree.children(0))
+        best_nodes = [n for n in tree.children(0) if tree.N[n] == max_N]
+        return tree.move[random.choice(best_nodes)]
+
+    # Visit counts of the root's children, keyed by move
+    def root_visits(self):
+        return {self.tree.move[n]: self.tree.N[n] for n in self.tree.children(0)}
+
+    # If a child node exists for a given move then go there
+    def move(self, move):
+        self.root_state.move(move)
+        for child in self.tree.children(0):
+            if self.tree.move[child] == move:
+                self.tree.reroot(child)
+                return
+        self.tree.reset()
+
+
+# Runs one independent search in a worker process for root parallelization
+def search_root(state, time_limit, max_nodes, leaf_batch, rollout_policy, seed):
+    random.seed(seed)
+    if max_nodes is None:
+        mcts = MCTS(state, leaf_batch, rollout_policy)
+    else:
+        mcts = ArrayMCTS(state, max_nodes, leaf_batch, rollout_policy)
+    mcts.search(time_limit)
+    return mcts.root_visits(), mcts.num_rollouts
+
+
 class MCTSPlayer:
-    def __init__(self, piece, time_limit=1.0):
+    # max_nodes selects the array-backed tree with that node cap
+    # workers > 1 searches independent trees in a process pool and merges their root visit counts
+    # leaf_batch plays that many rollouts from every selected leaf
+    # reuse_tree keeps the single-process tree between moves and descends into the opponent's reply
+    # rollout_policy is "random" or "tactical" (see rollout.py)
+    # book is an OpeningBook (or path) whose moves are played without searching
+    def __init__(self, piece, time_limit=1.0, max_nodes=None, workers=1, leaf_batch=1, reuse_tree=True,
+                 rollout_policy="random", book=None):
         self.piece = piece
         self.time_limit = time_limit
+        self.max_nodes = max_nodes
+        self.workers = workers
+        self.leaf_batch = leaf_batch
+        self.reuse_tree = reuse_tree
+        self.rollout_policy = rollout_policy
         self.mcts = None
+        self.pool = None
+        self.num_rollouts = 0
+        self.book = load_book(book)
 
     def get_move(self, game, events):
+        if self.book is not None:
+            move = self.book.get_move(game)
+            if move is not None:
+                self.num_rollouts = 0
+                return move
         state = ConnectState(game)
-        self.mcts = MCTS(state)
+        if self.workers > 1:
+            return self.parallel_move(state)
+        if not (self.reuse_tree and self.mcts is not None and self.advance_tree(state)):
+            if self.max_nodes is None:
+                self.mcts = MCTS(state, self.leaf_batch, self.rollout_policy)
+            else:
+                self.mcts = ArrayMCTS(state, self.max_nodes, self.leaf_batch, self.rollout_policy)
         self.mcts.search(self.time_limit)
+        self.num_rollouts = self.mcts.num_rollouts
         move = self.mcts.best_move()
         self.mcts.move(move)
         return move
+
+    # Moves the kept tree's root to state by finding the opponent's reply since our
+    # last move; returns False when state is not one move past the current root
+    def advance_tree(self, state):
+        root_state = self.mcts.root_state
+        if state.pieces_placed == root_state.pieces_placed:
+            return state.board == root_state.board
+        if state.pieces_placed != root_state.pieces_placed + 1 or root_state.game_over_flag:
+            return False
+        diff = [(r, c) for r in range(6) for c in range(7) if state.board[r][c] != root_state.board[r][c]]
+        if len(diff) != 1:
+            return False
+        r, c = diff[0]
+        if root_state.board[r][c] != 0 or state.board[r][c] != root_state.turn + 1:
+            return False
+        self.mcts.move(c)
+        return True
+
+    # Root parallelization: every worker grows its own tree, root child visits are summed
+    def parallel_move(self, state):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        seed = random.getrandbits(32)
+        futures = [self.pool.submit(search_root, state, self.time_limit, self.max_nodes,
+                                    self.leaf_batch, self.rollout_policy, seed + i)
+                   for i in range(self.workers)]
+        visits = {}
+        self.num_rollouts = 0
+        for future in futures:
+            worker_visits, rollouts = future.result()
+            self.num_rollouts += rollouts
+            for move, n in worker_visits.items():
+                visits[move] = visits.get(move, 0) + n
+        if not visits:
+            return random.choice([c for c in range(7) if state.board[0][c] == 0])
+        max_N = max(visits.values())
+        return random.choice([move for move, n in visits.items() if n == max_N])
+
+    # Shuts down the worker pool used by parallel searches
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+if __name__ == "__main__":
+    # Rollouts/second of MCTS.search from the empty board, against the previous
+    # selection step that deep-copied the root state and scored children twice
+    class DeepcopySelectMCTS(MCTS):
+        def select_node(self):
+            node = self.root
+            state = deepcopy(self.root_state)
+            while node.children:
+                values = [n.value() for n in node.children.values()]
+                max_val = max(values)
+                best = [n for n in node.children.values() if n.value() == max_val]
+                node = random.choice(best)
+                state.move(node.move)
+                if node.N == 0:
+                    return node, state
+            if not state.game_over_flag:
+                self.expand(node, state)
+                if node.children:
+                    node = random.choice(list(node.children.values()))
+                    state.move(node.move)
+            return node, state
+
+    for name, make in (("deepcopy select", DeepcopySelectMCTS),
+                       ("MCTS", MCTS),
+                       ("ArrayMCTS", ArrayMCTS),
+                       ("MCTS leaf_batch=64", lambda state: MCTS(state, leaf_batch=64))):
+        mcts = make(ConnectState())
+        mcts.search(3.0)
+        print(f"{name}: {mcts.num_rollouts} rollouts, {mcts.num_rollouts / mcts.run_time:.0f} rollouts/s")
+
+    # Combined rollout count of root-parallel search as the worker count grows
+    from bitboard import Connect4Bitboard
+    for workers in (1, 2, 4):
+        player = MCTSPlayer(1, time_limit=3.0, workers=workers)
+        player.get_move(Connect4Bitboard(), None)
+        print(f"workers={workers}: {player.num_rollouts} rollouts")
+        player.close()
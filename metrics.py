@@ -0,0 +1,147 @@
+"""
+Streaming training metrics
+
+MetricsRecorder keeps constant-size rolling windows, plain counters and
+accumulated timers, and appends periodic snapshots to a JSONL log. Nothing
+grows with the length of a run, and nothing blocks on a display.
+
+Plots are made offline from the log:
+
+    python metrics.py training_metrics.jsonl
+"""
+
+import json
+import sys
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+class RollingMean:
+    """Mean of the last `window` values, updated in O(1)."""
+
+    def __init__(self, window):
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+
+    def add(self, value):
+        if len(self.values) == self.values.maxlen:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+
+    @property
+    def mean(self):
+        return self.total / len(self.values) if self.values else 0.0
+
+
+class MetricsRecorder:
+    """Rolling means, counters and timers for a training run, logged as JSON lines.
+
+    Counters are reported as per-second rates over the run and timers as total
+    seconds. Records are buffered and appended to `path` every `flush_every` logs.
+    """
+
+    def __init__(self, path=None, window=100, flush_every=10):
+        self.path = path
+        self.window = window
+        self.flush_every = flush_every
+        self.rolling = {}
+        self.counts = defaultdict(int)
+        self.timers = defaultdict(float)
+        self.start = time.perf_counter()
+        self._buffer = []
+        if path is not None:
+            open(path, "w").close()
+
+    def observe(self, name, value):
+        """Add a value to the rolling window called name."""
+        if name not in self.rolling:
+            self.rolling[name] = RollingMean(self.window)
+        self.rolling[name].add(value)
+
+    def mean(self, name):
+        return self.rolling[name].mean if name in self.rolling else 0.0
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+
+    @contextmanager
+    def timer(self, name):
+        """Accumulate the wall time spent inside the block under name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] += time.perf_counter() - start
+
+    def snapshot(self, **fields):
+        """Current metrics as a flat dict, starting with the given fields."""
+        elapsed = time.perf_counter() - self.start
+        record = dict(fields)
+        record["elapsed_s"] = round(elapsed, 3)
+        for name, rolling in self.rolling.items():
+            record[name] = rolling.mean
+        for name, n in self.counts.items():
+            record[name] = n
+            record[f"{name}_per_s"] = n / elapsed if elapsed > 0 else 0.0
+        for name, seconds in self.timers.items():
+            record[f"{name}_s"] = round(seconds, 3)
+        return record
+
+    def log(self, **fields):
+        """Record a snapshot; it is written out with the next flush."""
+        record = self.snapshot(**fields)
+        self._buffer.append(record)
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+        return record
+
+    def flush(self):
+        if self.path is not None and self._buffer:
+            with open(self.path, "a") as f:
+                for record in self._buffer:
+                    f.write(json.dumps(record) + "\n")
+        self._buffer.clear()
+
+    def close(self):
+        self.flush()
+
+
+def read_metrics(path):
+    """Load every record of a JSONL metrics log."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def plot_metrics(path, output_prefix=None):
+    """Save loss and win-rate plots for a metrics log as PNG files next to it."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib import pyplot as plt
+
+    records = read_metrics(path)
+    output_prefix = output_prefix or path.rsplit(".", 1)[0]
+    episodes = [r["episode"] for r in records]
+
+    plt.figure()
+    plt.plot(episodes, [r.get("loss", 0.0) for r in records])
+    plt.xlabel("Episode")
+    plt.ylabel("Loss (rolling avg)")
+    plt.title("DQN Loss Over Time")
+    plt.grid(True)
+    plt.savefig(f"{output_prefix}_loss.png")
+
+    plt.figure(figsize=(10, 5))
+    plt.plot(episodes, [r.get("win_rate", 0.0) for r in records], label="Win Rate (rolling avg)", color="green")
+    plt.xlabel("Episode")
+    plt.ylabel("Win Rate")
+    plt.title("DQN Win Rate Over Time")
+    plt.ylim([0, 1])
+    plt.grid(True)
+    plt.legend()
+    plt.savefig(f"{output_prefix}_winrate.png")
+
+
+if __name__ == "__main__":
+    plot_metrics(sys.argv[1] if len(sys.argv) > 1 else "training_metrics.jsonl")
@@ -0,0 +1,211 @@
+"""
+Opening book for Connect4
+
+Opening positions are the same in every game, so their moves are computed once
+offline and stored in a compact sorted binary file. Agents given a book look
+the current position up before searching and play the stored move when there
+is one.
+
+File layout (little-endian): a 16-byte header (magic b"C4BK", version, max ply,
+entry count), the sorted uint64 canonical position keys (symmetry.canonical_key,
+so a position and its mirror image share an entry), then one int8 move (in the
+canonical orientation) and one int8 score per entry. The file is memory-mapped and looked up
+by binary search, so opening a book costs nothing and lookups touch only a few
+pages.
+
+By default the book covers the positions reachable when the side using it
+follows the book and the opponent plays anything, for both colors:
+
+    python opening_book.py --ply 8 --depth 7 --workers 8         # moves from AlphaBetaPlayer at depth 7
+    python opening_book.py --ply 10 --solve-from 8 --workers 8   # perfect play from ply 8 on
+
+Solving is exact but slow in pure Python, and slower the emptier the board,
+so --solve-from picks the first ply whose moves come from solver.py.
+"""
+
+import argparse
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bitboard import Connect4Bitboard
+from symmetry import canonical_key, mirror_move
+
+MAGIC = b"C4BK"
+VERSION = 2
+HEADER = struct.Struct("<4sBBxxQ")
+# stored for moves that were searched to a fixed depth rather than solved
+UNKNOWN_SCORE = -128
+
+
+class OpeningBook:
+    """Read-only, memory-mapped opening book."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, max_ply, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self.max_ply = max_ply
+        self.count = count
+        if count:
+            data = np.memmap(path, dtype=np.uint8, mode="r")
+            end = HEADER.size + 8 * count
+            self.keys = data[HEADER.size:end].view("<u8")
+            self.moves = data[end:end + count].view(np.int8)
+            self.scores = data[end + count:end + 2 * count].view(np.int8)
+
+    def __len__(self):
+        return self.count
+
+    def probe(self, key):
+        """(move, score) stored for a position key, or None."""
+        if not self.count:
+            return None
+        i = int(np.searchsorted(self.keys, np.uint64(key)))
+        if i < self.count and self.keys[i] == key:
+            return int(self.moves[i]), int(self.scores[i])
+        return None
+
+    def lookup(self, game):
+        """(move, score) for a running game, or None when the position is not in the book."""
+        if game.game_over or game.pieces_placed > self.max_ply:
+            return None
+        masks = getattr(game, "masks", None)
+        if masks is None:
+            masks = Connect4Bitboard.from_game(game).masks
+        key, mirrored = canonical_key(masks, game.pieces_placed % 2)
+        entry = self.probe(key)
+        if entry is not None and mirrored:
+            return mirror_move(entry[0]), entry[1]
+        return entry
+
+    def get_move(self, game):
+        """Book move for a running game, or None."""
+        entry = self.lookup(game)
+        return None if entry is None else entry[0]
+
+
+def load_book(book):
+    """An OpeningBook from a path; None and already opened books are passed through."""
+    if isinstance(book, str):
+        return OpeningBook(book)
+    return book
+
+
+def write_book(path, entries, max_ply):
+    """Write a {key: (move, score)} dict as a sorted book file."""
+    keys = np.array(sorted(entries), dtype="<u8")
+    moves = np.array([entries[int(k)][0] for k in keys], dtype=np.int8)
+    scores = np.array([entries[int(k)][1] for k in keys], dtype=np.int8)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, max_ply, len(keys)))
+        f.write(keys.tobytes())
+        f.write(moves.tobytes())
+        f.write(scores.tobytes())
+
+
+# solver built in this worker process; its scores are exact, so sharing its table
+# between positions cannot change a result
+_solver = None
+
+
+def book_move(task):
+    """(move, score) for the position reached by task = (moves, depth, solve)."""
+    global _solver
+    moves, depth, solve = task
+    board = Connect4Bitboard()
+    for col in moves:
+        board.play_move(col)
+    if solve:
+        from solver import Solver
+        if _solver is None:
+            _solver = Solver()
+        return _solver.best_move(board)
+    from alphaBeta import AlphaBetaPlayer
+    # a fresh player per position: a table or move-ordering state left by other
+    # positions would make the book depend on the order positions are searched in
+    player = AlphaBetaPlayer(board.turn + 1, depth=depth)
+    return player.get_move(board, None), UNKNOWN_SCORE
+
+
+def build_book(max_ply=8, depth=7, solve_from=None, full=False, workers=1, verbose=True):
+    """Compute the book entries for every position up to max_ply stones.
+
+    Moves come from a depth-limited AlphaBetaPlayer, or from the solver for
+    positions with at least solve_from stones.
+
+    Unless full is set, only positions where the side using the book followed it
+    are expanded, which keeps the book about 7x smaller per book move.
+    """
+    entries = {}
+    # canonical key -> move in the orientation of the frontier position that was searched
+    played = {}
+    # canonical key -> (moves, mirrored, sides): sides holds the players whose book line reaches the position
+    frontier = {Connect4Bitboard().key(): ([], False, {0, 1})}
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for ply in range(max_ply + 1):
+            start = time.perf_counter()
+            mover = ply % 2
+            todo = [(key, moves, mirrored) for key, (moves, mirrored, sides) in frontier.items()
+                    if full or mover in sides]
+            solve = solve_from is not None and ply >= solve_from
+            tasks = [(moves, depth, solve) for _, moves, _ in todo]
+            results = pool.map(book_move, tasks, chunksize=max(1, len(tasks) // (workers * 8))) if pool \
+                else map(book_move, tasks)
+            for (key, _, mirrored), (move, score) in zip(todo, results):
+                played[key] = move
+                entries[key] = (mirror_move(move) if mirrored else move, score)
+            if verbose:
+                print(f"ply {ply}: {len(todo)} positions in {time.perf_counter() - start:.1f}s")
+            if ply == max_ply:
+                break
+
+            children = {}
+            for key, (moves, _, sides) in frontier.items():
+                board = Connect4Bitboard()
+                for col in moves:
+                    board.play_move(col)
+                for col in board.get_valid_moves():
+                    # off the book line the mover no longer follows its own book
+                    child_sides = sides if full or key not in played or col == played[key] \
+                        else sides - {mover}
+                    if not child_sides:
+                        continue
+                    board.play_move(col)
+                    if not board.game_over:
+                        child_key, child_mirrored = canonical_key(board.masks, board.pieces_placed % 2)
+                        if child_key in children:
+                            children[child_key][2].update(child_sides)
+                        else:
+                            children[child_key] = (moves + [col], child_mirrored, set(child_sides))
+                    board.undo_move()
+            frontier = children
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a Connect4 opening book.")
+    parser.add_argument("--ply", type=int, default=8, help="deepest position in the book, in stones played")
+    parser.add_argument("--depth", type=int, default=7, help="AlphaBetaPlayer search depth for book moves")
+    parser.add_argument("--solve-from", type=int, help="use perfect play from the solver from this ply on")
+    parser.add_argument("--full", action="store_true", help="include every position, not only book lines")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--output", default="opening_book.bin", help="book file to write")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    entries = build_book(args.ply, args.depth, args.solve_from, args.full, args.workers)
+    write_book(args.output, entries, args.ply)
+    print(f"wrote {len(entries)} positions to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
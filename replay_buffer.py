@@ -0,0 +1,122 @@
+"""
+Replay buffer for DQN training
+
+ReplayBuffer is a ring buffer that preallocates one contiguous tensor per
+transition field. Boards are stored as int8 in the encoding produced by
+dqnPlayer.encode_boards (1 = player to move, -1 = opponent, 0 = empty), and a
+whole minibatch is gathered with a single index tensor.
+
+With a path the fields are NumPy memory maps on disk, so a buffer can be much
+larger than RAM and is picked up again by the next run that opens the same
+directory with the same capacity.
+
+With symmetric set, every transition is stored in the orientation of its
+state's canonical form (see symmetry.py) and each sampled transition is
+mirrored with probability 1/2, so one stored copy stands for both mirror
+images.
+"""
+
+import json
+import os
+
+import numpy as np
+import torch
+
+from symmetry import canonical_boards
+
+ROWS, COLS = 6, 7
+
+FIELDS = {
+    "states": (np.int8, (ROWS, COLS)),
+    "actions": (np.int64, ()),
+    "rewards": (np.float32, ()),
+    "next_states": (np.int8, (ROWS, COLS)),
+    "dones": (np.float32, ()),
+}
+
+
+class ReplayBuffer:
+    """Fixed-capacity ring buffer of (state, action, reward, next_state, done) transitions."""
+
+    def __init__(self, capacity, path=None, symmetric=True):
+        self.capacity = capacity
+        self.path = path
+        self.symmetric = symmetric
+        self.position = 0
+        self.size = 0
+        self.arrays = {}
+        if path is None:
+            for name, (dtype, shape) in FIELDS.items():
+                self.arrays[name] = np.zeros((capacity,) + shape, dtype=dtype)
+        else:
+            self._open_memmaps(path)
+        self.tensors = {name: torch.from_numpy(array) for name, array in self.arrays.items()}
+
+    def _open_memmaps(self, path):
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        meta = None
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["capacity"] != self.capacity:
+                raise ValueError(f"Replay buffer at {path} has capacity {meta['capacity']}, not {self.capacity}")
+            self.position = meta["position"]
+            self.size = meta["size"]
+        mode = "r+" if meta is not None else "w+"
+        for name, (dtype, shape) in FIELDS.items():
+            self.arrays[name] = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode=mode,
+                                          shape=(self.capacity,) + shape)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, states, actions, rewards, next_states, dones):
+        """Append a batch of transitions; states are encoded (n, 1, 6, 7) or (n, 6, 7) tensors."""
+        n = len(actions)
+        if n == 0:
+            return
+        index = (self.position + torch.arange(n)) % self.capacity
+        states = torch.as_tensor(states).reshape(n, ROWS, COLS).to(torch.int8)
+        actions = torch.as_tensor(actions, dtype=torch.int64)
+        next_states = torch.as_tensor(next_states).reshape(n, ROWS, COLS).to(torch.int8)
+        if self.symmetric:
+            states, actions, next_states = self._mirror(torch.from_numpy(canonical_boards(states.numpy())),
+                                                        states, actions, next_states)
+        self.tensors["states"][index] = states
+        self.tensors["actions"][index] = actions
+        self.tensors["rewards"][index] = torch.as_tensor(rewards, dtype=torch.float32)
+        self.tensors["next_states"][index] = next_states
+        self.tensors["dones"][index] = torch.as_tensor(dones, dtype=torch.float32)
+        self.position = (self.position + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def sample(self, batch_size):
+        """Random minibatch as (states, actions, rewards, next_states, dones) ready for the network."""
+        index = torch.randint(self.size, (batch_size,))
+        t = self.tensors
+        states, actions, next_states = t["states"][index], t["actions"][index], t["next_states"][index]
+        if self.symmetric:
+            states, actions, next_states = self._mirror(torch.rand(batch_size) < 0.5, states, actions, next_states)
+        return (states.unsqueeze(1).float(),
+                actions,
+                t["rewards"][index],
+                next_states.unsqueeze(1).float(),
+                t["dones"][index])
+
+    @staticmethod
+    def _mirror(flip, states, actions, next_states):
+        """Mirror the transitions selected by the boolean tensor flip."""
+        board_flip = flip[:, None, None]
+        return (torch.where(board_flip, states.flip(-1), states),
+                torch.where(flip, COLS - 1 - actions, actions),
+                torch.where(board_flip, next_states.flip(-1), next_states))
+
+    def flush(self):
+        """Write a disk-backed buffer and its fill state to disk (no-op in memory)."""
+        if self.path is None:
+            return
+        for array in self.arrays.values():
+            array.flush()
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"capacity": self.capacity, "position": self.position, "size": self.size}, f)
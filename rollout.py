@@ -0,0 +1,108 @@
+"""
+Rollout engine for Monte Carlo Tree Search
+
+Plays a position out to the end on bitboards (see bitboard.py). The legal
+column list is maintained incrementally as columns fill up, and the winner is
+recorded at the moment the winning piece is placed, so a finished playout
+never rescans the board.
+
+Policies:
+- "random":   uniformly random legal moves
+- "tactical": play an immediate win if there is one, otherwise block the
+              opponent's immediate win, otherwise move at random
+
+batch_playout runs many random playouts from one position in lockstep with
+NumPy: the boards are uint64 masks, moves are applied through a (k, 7) height
+array, and wins are found by testing every board against the 69 window masks.
+"""
+
+import random
+
+import numpy as np
+
+from bitboard import ROWS, COLS, H1, wins_at
+from threats import cell_column, playable_threats
+
+POLICIES = ("random", "tactical")
+
+# bitmask of each of the 69 windows of four cells
+WINDOW_MASKS = np.array(
+    [sum(1 << ((c + i) * H1 + h) for i in range(4)) for h in range(ROWS) for c in range(COLS - 3)] +
+    [sum(1 << (c * H1 + h + i) for i in range(4)) for c in range(COLS) for h in range(ROWS - 3)] +
+    [sum(1 << ((c + i) * H1 + h + i) for i in range(4)) for h in range(ROWS - 3) for c in range(COLS - 3)] +
+    [sum(1 << ((c + i) * H1 + h - i) for i in range(4)) for h in range(3, ROWS) for c in range(COLS - 3)],
+    dtype=np.uint64)
+
+
+def playout(masks, heights, turn, policy="random"):
+    """Play random moves from the given position until the game ends.
+
+    masks and heights are not modified. Returns the index (0 or 1) of the
+    winning player, or -1 for a draw.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown rollout policy {policy!r}, expected one of {POLICIES}")
+    masks = list(masks)
+    heights = list(heights)
+    legal = [c for c in range(COLS) if heights[c] < ROWS]
+    tactical = policy == "tactical"
+
+    while legal:
+        col = None
+        if tactical:
+            col = _forced_move(masks, turn)
+        if col is None:
+            col = random.choice(legal)
+
+        bit = 1 << (col * H1 + heights[col])
+        masks[turn] |= bit
+        if wins_at(masks[turn], bit):
+            return turn
+        heights[col] += 1
+        if heights[col] == ROWS:
+            legal.remove(col)
+        turn ^= 1
+    return -1
+
+
+def _forced_move(masks, turn):
+    """Return the leftmost column that wins now, else one that blocks the opponent's win, else None."""
+    cells = playable_threats(masks, turn) or playable_threats(masks, turn ^ 1)
+    if cells:
+        return cell_column(cells & -cells)
+    return None
+
+
+def batch_playout(masks, heights, turn, k, rng):
+    """Play k uniformly random playouts from the same position in lockstep.
+
+    rng is a numpy Generator. Returns [player 0 wins, player 1 wins, draws].
+    """
+    boards = np.array([[masks[0]] * k, [masks[1]] * k], dtype=np.uint64)
+    heights = np.tile(np.array(heights, dtype=np.int64), (k, 1))
+    result = np.full(k, -1)
+    active = np.arange(k)
+
+    while len(active):
+        h = heights[active]
+        # random legal column per game: argmax of random keys with full columns masked out
+        keys = rng.random((len(active), COLS))
+        keys[h >= ROWS] = -1.0
+        cols = keys.argmax(axis=1)
+        rows = h[np.arange(len(active)), cols]
+
+        bits = np.left_shift(np.uint64(1), (cols * H1 + rows).astype(np.uint64))
+        boards[turn, active] |= bits
+        heights[active, cols] += 1
+
+        placed = boards[turn, active]
+        won = ((placed[:, None] & WINDOW_MASKS) == WINDOW_MASKS).any(axis=1)
+        result[active[won]] = turn
+        # every game is at the same ply, so boards fill up together (draws stay -1)
+        full = (heights[active] >= ROWS).all(axis=1)
+        active = active[~(won | full)]
+        turn ^= 1
+
+    p0 = int(np.count_nonzero(result == 0))
+    p1 = int(np.count_nonzero(result == 1))
+    return [p0, p1, k - p0 - p1]
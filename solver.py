@@ -0,0 +1,151 @@
+"""
+Perfect-play solver for Connect4
+
+Negamax over the bitboard layout of bitboard.py, in the style of Pascal Pons'
+solver: only moves that do not hand the opponent an immediate win are searched,
+moves are tried in order of how many winning cells they create (center first on
+ties), upper bounds are cached in a transposition table, and the exact score is
+found by a sequence of null-window searches.
+
+Scores are from the side to move: 0 is a draw, a positive score is a win and a
+negative one a loss. The sooner the game ends the larger the magnitude; a win
+with the mover's k-th stone scores 22 - k.
+"""
+
+from bitboard import BOTTOM_MASK, COLS, H1, ROWS, Connect4Bitboard
+from threats import playable_cells, winning_cells
+
+CELLS = ROWS * COLS
+CENTER_ORDER = (3, 2, 4, 1, 5, 0, 6)
+COLUMN_MASKS = [((1 << ROWS) - 1) << (c * H1) for c in range(COLS)]
+TOP_MASKS = [1 << (ROWS - 1 + c * H1) for c in range(COLS)]
+
+
+def popcount(x):
+    return bin(x).count("1")
+
+
+def _truncate_half(x):
+    # division by two rounding toward zero, for the aspiration bounds
+    return -(-x // 2) if x < 0 else x // 2
+
+
+class Solver:
+    """Exact game-theoretic solver; the table of upper bounds is kept between calls."""
+
+    def __init__(self, table_size=1 << 22):
+        self.table_size = table_size
+        self.table = {}
+        self.nodes = 0
+
+    def solve(self, game):
+        """Exact score of a running game from the side to move."""
+        board = game if isinstance(game, Connect4Bitboard) else Connect4Bitboard.from_game(game)
+        mover = board.pieces_placed % 2
+        return self.solve_position(board.masks[mover], board.masks[0] | board.masks[1], board.pieces_placed)
+
+    def best_move(self, game):
+        """(column, score) of a perfect move in a running game."""
+        board = game if isinstance(game, Connect4Bitboard) else Connect4Bitboard.from_game(game)
+        mover = board.pieces_placed % 2
+        position = board.masks[mover]
+        mask = board.masks[0] | board.masks[1]
+        moves = board.pieces_placed
+        best = None
+        for col in CENTER_ORDER:
+            if mask & TOP_MASKS[col]:
+                continue
+            move = (mask + (1 << col * H1)) & COLUMN_MASKS[col]
+            if winning_cells(position, mask) & move:
+                return col, (CELLS + 1 - moves) // 2
+            score = -self.solve_position(position ^ mask, mask | move, moves + 1)
+            if best is None or score > best[1]:
+                best = (col, score)
+        return best
+
+    def solve_position(self, position, mask, moves):
+        """Exact score for the mover with stones `position`, occupied cells `mask` and `moves` stones played."""
+        if winning_cells(position, mask) & playable_cells(mask):
+            return (CELLS + 1 - moves) // 2
+        low = -((CELLS - moves) // 2)
+        high = (CELLS + 1 - moves) // 2
+        while low < high:
+            med = low + (high - low) // 2
+            if med <= 0 and _truncate_half(low) < med:
+                med = _truncate_half(low)
+            elif med >= 0 and _truncate_half(high) > med:
+                med = _truncate_half(high)
+            score = self._negamax(position, mask, moves, med, med + 1)
+            if score <= med:
+                high = score
+            else:
+                low = score
+        return low
+
+    def _negamax(self, position, mask, moves, alpha, beta):
+        """Score within [alpha, beta] of a position where the mover cannot win immediately."""
+        self.nodes += 1
+        possible = playable_cells(mask)
+        opponent = position ^ mask
+        opponent_wins = winning_cells(opponent, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                # two cells to block at once
+                return -((CELLS - moves) // 2)
+            possible = forced
+        # never play directly below a cell the opponent wins at
+        candidates = possible & ~(opponent_wins >> 1)
+        if not candidates:
+            return -((CELLS - moves) // 2)
+        if moves >= CELLS - 2:
+            return 0
+
+        low = -((CELLS - 2 - moves) // 2)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        key = position + mask + BOTTOM_MASK
+        high = (CELLS - 1 - moves) // 2
+        cached = self.table.get(key)
+        if cached is not None:
+            high = cached
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        ordered = []
+        for col in CENTER_ORDER:
+            move = candidates & COLUMN_MASKS[col]
+            if move:
+                ordered.append((popcount(winning_cells(position | move, mask)), move))
+        # stable sort keeps the center-first order among equal scores
+        ordered.sort(key=lambda item: -item[0])
+
+        for _, move in ordered:
+            score = -self._negamax(opponent, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        if len(self.table) >= self.table_size:
+            self.table.clear()
+        self.table[key] = alpha
+        return alpha
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # solve the position reached by the columns given on the command line, e.g. "python solver.py 3 3 2 4 4 2"
+    board = Connect4Bitboard()
+    for col in sys.argv[1:]:
+        board.play_move(int(col))
+    solver = Solver()
+    start = time.perf_counter()
+    col, score = solver.best_move(board)
+    elapsed = time.perf_counter() - start
+    print(f"best={col} score={score} nodes={solver.nodes} time={elapsed:.2f}s")
@@ -0,0 +1,65 @@
+"""
+Mirror symmetry of Connect4 positions
+
+A position and its mirror image (columns in reverse order) have the same value,
+with mirrored best moves. Caches keyed on the canonical form of a position,
+which is the smaller of its key and its mirror's key, share one entry between
+the two. Moves stored under a canonical key are stored in the canonical
+orientation and are mirrored back with mirror_move when the position being
+looked up is the mirrored one.
+"""
+
+import numpy as np
+
+from bitboard import COLS, H1, position_key
+
+COLUMN_MASK = (1 << H1) - 1
+
+
+def mirror_mask(mask):
+    """Bitboard mask (or position key) with the columns in reverse order."""
+    mirrored = 0
+    for c in range(COLS):
+        mirrored |= ((mask >> (c * H1)) & COLUMN_MASK) << ((COLS - 1 - c) * H1)
+    return mirrored
+
+
+def mirror_move(col):
+    """Column col seen in the mirror."""
+    return COLS - 1 - col
+
+
+def canonical_key(masks, mover):
+    """(key, mirrored): the smaller of the position_key of a position and of its mirror image,
+    and whether that is the mirror's."""
+    key = position_key(masks, mover)
+    mirrored = mirror_mask(key)
+    if mirrored < key:
+        return mirrored, True
+    return key, False
+
+
+def canonical_hash(board):
+    """(hash, mirrored) for a Connect4Bitboard: the smaller of its Zobrist hash and its mirror's."""
+    if board.mirror_hash < board.hash:
+        return board.mirror_hash, True
+    return board.hash, False
+
+
+def mirror_boards(boards):
+    """(..., 6, 7) array of boards with the columns in reverse order."""
+    return np.asarray(boards)[..., ::-1]
+
+
+def canonical_boards(boards):
+    """Boolean array marking the boards of an (n, 6, 7) array whose mirror image is their canonical form.
+
+    The canonical orientation is the lexicographically smaller of the flattened
+    board and its mirror; symmetric boards are never mirrored.
+    """
+    flat = np.asarray(boards).reshape(len(boards), -1)
+    mirrored = mirror_boards(boards).reshape(len(boards), -1)
+    differs = flat != mirrored
+    first = differs.argmax(axis=1)
+    rows = np.arange(len(flat))
+    return differs.any(axis=1) & (mirrored[rows, first] < flat[rows, first])
@@ -0,0 +1,22 @@
+import pytest
+
+from alphaBeta import AlphaBetaPlayer
+from bitboard import Connect4Bitboard
+
+
+# A player that deepens one ply at a time keeps its table between searches, as
+# iterative deepening does, so every later search tries an earlier best move
+# first. Moves that then fail low under the null window must not be played as
+# if they tied with the forced win.
+@pytest.mark.parametrize("moves, win", [
+    ([3, 1, 4, 4], 5),
+    ([1, 4, 0, 1, 6, 1, 6, 6, 3, 4], 2),
+])
+def test_warm_table_player_plays_forced_win(moves, win):
+    game = Connect4Bitboard()
+    for col in moves:
+        game.play_move(col)
+    player = AlphaBetaPlayer(game.turn + 1)
+    for depth in range(1, 6):
+        player.depth = depth
+        assert player.get_move(game, None) == win, depth
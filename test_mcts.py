@@ -0,0 +1,32 @@
+from mcts import MCTS, ConnectState, Node
+
+
+# Always selects the root's column 3 child and plays out a fixed game from it
+# in which player 1 stacks four in column 0, so every rollout is a loss for
+# player 0, who moved into the leaf
+class FixedRolloutMCTS(MCTS):
+    def __init__(self):
+        super().__init__(ConnectState())
+        self.leaf = Node(3, self.root)
+        self.root.add_children([self.leaf])
+
+    def select_node(self):
+        state = self.root_state.copy()
+        state.move(self.leaf.move)
+        return self.leaf, state
+
+    # advances the state it is given, as the rollouts of the original MCTS did
+    def roll_out(self, state):
+        for col in (0, 1, 0, 1, 0, 1, 0):
+            state.move(col)
+        return 1
+
+
+# A lost rollout must count as a loss for the player who moved into the leaf,
+# not as a win for whichever player is to move once the rollout has finished
+def test_rollout_credited_to_player_who_moved_into_leaf():
+    mcts = FixedRolloutMCTS()
+    mcts.search(0.01)
+    assert mcts.leaf.N > 0
+    assert mcts.leaf.Q == 0
+    assert mcts.root.Q == mcts.root.N
@@ -0,0 +1,41 @@
+from alphaBeta import AlphaBetaPlayer
+from bitboard import Connect4Bitboard
+from opening_book import OpeningBook, build_book, write_book
+from symmetry import mirror_move
+
+MAX_PLY = 4
+DEPTH = 4
+
+
+# best move of a fresh AlphaBetaPlayer for the position reached by moves
+def search(moves):
+    board = Connect4Bitboard()
+    for col in moves:
+        board.play_move(col)
+    return AlphaBetaPlayer(board.turn + 1, depth=DEPTH).get_move(board, None)
+
+
+# Every book move must be the move a fresh search plays in the position, or in
+# its mirror image (the book searches one orientation of each pair)
+def test_book_moves_match_fresh_search(tmp_path):
+    path = str(tmp_path / "book.bin")
+    write_book(path, build_book(MAX_PLY, DEPTH, verbose=False), MAX_PLY)
+    book = OpeningBook(path)
+
+    checked = 0
+    lines = [[]]
+    while lines:
+        moves = lines.pop()
+        board = Connect4Bitboard()
+        for col in moves:
+            board.play_move(col)
+        if board.game_over:
+            continue
+        col = book.get_move(board)
+        if col is not None:
+            mirrored = [mirror_move(c) for c in moves]
+            assert col in (search(moves), mirror_move(search(mirrored))), moves
+            checked += 1
+        if len(moves) < MAX_PLY:
+            lines.extend(moves + [c] for c in board.get_valid_moves())
+    assert checked >= len(book)
@@ -0,0 +1,85 @@
+"""
+Threat analysis on bitboards
+
+Works on the masks of bitboard.py and answers the questions every agent asks
+before looking further ahead: where would each player complete four, and which
+of those cells can be played right now? All answers are bitmasks computed with
+a few dozen shifts, without trying moves on the board.
+
+- winning cells: empty cells that would complete four for a player
+- playable cells: the lowest empty cell of every column that is not full
+- playable threats: winning cells that are also playable, i.e. a move that
+  wins at once (for the side to move) or must be blocked (for the opponent)
+"""
+
+from collections import namedtuple
+
+from bitboard import BOARD_MASK, BOTTOM_MASK, H1
+
+# winning cells of players 0 and 1, the cells playable now, and the playable
+# threats (winning cells that are also playable) of players 0 and 1, all bitmasks
+Threats = namedtuple("Threats", ["wins", "playable", "threats"])
+
+
+def winning_cells(position, mask):
+    """Empty cells where the stones in `position` would complete four, given occupied cells `mask`."""
+    # vertical
+    r = (position << 1) & (position << 2) & (position << 3)
+    # horizontal and both diagonals, with the gap anywhere in the line
+    for d in (H1, H1 - 1, H1 + 1):
+        p = (position << d) & (position << 2 * d)
+        r |= p & (position << 3 * d)
+        r |= p & (position >> d)
+        p = (position >> d) & (position >> 2 * d)
+        r |= p & (position << d)
+        r |= p & (position >> 3 * d)
+    return r & (BOARD_MASK ^ mask)
+
+
+def playable_cells(mask):
+    """The next free cell of every column that is not full."""
+    return (mask + BOTTOM_MASK) & BOARD_MASK
+
+
+def analyze(masks):
+    """Winning cells and playable threats of both players, and the playable cells, in one pass."""
+    mask = masks[0] | masks[1]
+    wins = (winning_cells(masks[0], mask), winning_cells(masks[1], mask))
+    playable = playable_cells(mask)
+    return Threats(wins, playable, (wins[0] & playable, wins[1] & playable))
+
+
+def playable_threats(masks, player):
+    """Cells where `player` completes four with a move that can be played now."""
+    mask = masks[0] | masks[1]
+    return winning_cells(masks[player], mask) & playable_cells(mask)
+
+
+def forced_winner(threats, mover):
+    """Index of the player who wins by force within the next two plies, or None.
+
+    threats is the analyze() result of the position. The side to move wins if
+    it has a playable threat. Otherwise its opponent wins if it has two playable
+    threats, since only one can be blocked.
+    """
+    if threats.threats[mover]:
+        return mover
+    opponent_threats = threats.threats[mover ^ 1]
+    if opponent_threats & (opponent_threats - 1):
+        return mover ^ 1
+    return None
+
+
+def cell_column(cell):
+    """Column of a single-bit cell mask."""
+    return (cell.bit_length() - 1) // H1
+
+
+def columns(cells):
+    """Columns of every set cell, in increasing order."""
+    cols = []
+    while cells:
+        low = cells & -cells
+        cols.append(cell_column(low))
+        cells ^= low
+    return cols
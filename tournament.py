@@ -0,0 +1,262 @@
+"""
+Headless tournament runner for Connect4 agents
+
+Plays round-robin or gauntlet matches between agents across a process pool.
+Colors alternate between games of a pairing, every game gets its own
+deterministic seed, and agents are built afresh for every game, so a tournament
+of agents without time limits can be rerun exactly. Reports win/draw/loss
+tables with 95% confidence intervals on the score, Elo estimates, and average
+move latency for each agent.
+
+Agents are given as name[:key=value,...], for example:
+
+    python tournament.py random heuristic alphabeta:depth=5 mcts:time_limit=0.2 --games 100 --workers 8
+    python tournament.py alphabeta:time_limit=0.1 mcts heuristic --mode gauntlet --json results.json
+"""
+
+import argparse
+import ast
+import json
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+
+from bitboard import Connect4Bitboard, has_four
+
+
+def _random_player(piece, **kwargs):
+    from player import RandomPlayer
+    return RandomPlayer(piece, **kwargs)
+
+
+def _heuristic_player(piece, **kwargs):
+    from heuristic_player import HeuristicPlayer
+    return HeuristicPlayer(piece, **kwargs)
+
+
+def _alphabeta_player(piece, **kwargs):
+    from alphaBeta import AlphaBetaPlayer
+    return AlphaBetaPlayer(piece, **kwargs)
+
+
+def _mcts_player(piece, **kwargs):
+    from mcts import MCTSPlayer
+    return MCTSPlayer(piece, **kwargs)
+
+
+def _dqn_player(piece, model_path="connect4_self.pth", **kwargs):
+    from dqnPlayer import DQNPlayer
+    return DQNPlayer(piece, model_path, **kwargs)
+
+
+AGENTS = {
+    "random": _random_player,
+    "heuristic": _heuristic_player,
+    "alphabeta": _alphabeta_player,
+    "mcts": _mcts_player,
+    "dqn": _dqn_player,
+}
+
+
+def parse_agent(spec):
+    """Split 'name:key=value,...' into (name, kwargs); values are Python literals."""
+    name, _, params = spec.partition(":")
+    if name not in AGENTS:
+        raise ValueError(f"Unknown agent {name!r}, expected one of {sorted(AGENTS)}")
+    kwargs = {}
+    for item in filter(None, params.split(",")):
+        key, _, value = item.partition("=")
+        try:
+            kwargs[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            kwargs[key] = value
+    return name, kwargs
+
+
+def make_agent(spec, piece):
+    """A new agent for a spec, playing as piece 1 or 2."""
+    name, kwargs = parse_agent(spec)
+    return AGENTS[name](piece, **kwargs)
+
+
+def play_game(task):
+    """Play one game. task is (game_id, first_spec, second_spec, seed).
+
+    Returns (game_id, winner, move_times) where winner is 0 or 1 for the first or
+    second player, or -1 for a draw, and move_times holds each side's
+    [total seconds, moves].
+    """
+    game_id, first, second, seed = task
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    # fresh agents, so no search state (tables, trees) carries over from other games
+    players = [make_agent(first, 1), make_agent(second, 2)]
+    try:
+        move_times = [[0.0, 0], [0.0, 0]]
+        game = Connect4Bitboard()
+        while not game.game_over:
+            side = game.turn
+            start = time.perf_counter()
+            col = players[side].get_move(game, None)
+            move_times[side][0] += time.perf_counter() - start
+            move_times[side][1] += 1
+            if col is None or not game.is_valid_move(col):
+                # an illegal or missing move forfeits the game
+                return game_id, 1 - side, move_times
+            game.play_move(col)
+        winner = next((p for p in (0, 1) if has_four(game.masks[p])), -1)
+        return game_id, winner, move_times
+    finally:
+        for player in players:
+            if hasattr(player, "close"):
+                player.close()
+
+
+def schedule(agents, games, mode, seed):
+    """Game tasks for every pairing, alternating which agent moves first."""
+    if mode == "round-robin":
+        pairings = list(combinations(range(len(agents)), 2))
+    elif mode == "gauntlet":
+        pairings = [(0, j) for j in range(1, len(agents))]
+    else:
+        raise ValueError(f"Unknown mode {mode!r}, expected 'round-robin' or 'gauntlet'")
+    rng = random.Random(seed)
+    tasks = []
+    for a, b in pairings:
+        for k in range(games):
+            first, second = (a, b) if k % 2 == 0 else (b, a)
+            tasks.append((len(tasks), first, second, rng.getrandbits(63)))
+    return pairings, tasks
+
+
+def score_interval(wins, draws, losses, z=1.96):
+    """Mean score (win = 1, draw = 0.5) and its Wilson confidence interval.
+
+    Unlike the normal approximation, the Wilson interval stays sensible for
+    one-sided results such as 10-0.
+    """
+    n = wins + draws + losses
+    if n == 0:
+        return 0.0, 0.0, 1.0
+    score = (wins + 0.5 * draws) / n
+    denominator = 1 + z * z / n
+    center = (score + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(score * (1 - score) / n + z * z / (4 * n * n)) / denominator
+    return score, max(0.0, center - half), min(1.0, center + half)
+
+
+def elo_difference(score):
+    """Elo difference implied by an expected score, clipped at +/-800."""
+    score = min(max(score, 1e-3), 1 - 1e-3)
+    # + 0.0 turns the -0.0 of an even score into 0.0
+    return max(-800.0, min(800.0, -400 * math.log10(1 / score - 1))) + 0.0
+
+
+def elo_ratings(n_agents, records, iterations=1000):
+    """Bradley-Terry Elo estimates (mean 0) from pairwise (a, b, wins, draws, losses) records.
+
+    Draws count as half a win for each side, and one virtual draw per pairing keeps
+    the estimates finite when a pairing is one-sided.
+    """
+    points = np.zeros(n_agents)
+    games = np.zeros((n_agents, n_agents))
+    for a, b, w, d, l in records:
+        n = w + d + l + 1
+        points[a] += w + 0.5 * d + 0.5
+        points[b] += l + 0.5 * d + 0.5
+        games[a, b] += n
+        games[b, a] += n
+    strength = np.ones(n_agents)
+    for _ in range(iterations):
+        denominator = (games / (strength[:, None] + strength[None, :])).sum(axis=1)
+        strength = np.where(denominator > 0, points / np.maximum(denominator, 1e-12), strength)
+        strength /= np.exp(np.log(strength).mean())
+    return 400 * np.log10(strength)
+
+
+def run_tournament(agents, games=100, mode="round-robin", workers=1, seed=0):
+    """Play the tournament and return a results dict (see format_results)."""
+    for spec in agents:
+        parse_agent(spec)
+    pairings, tasks = schedule(agents, games, mode, seed)
+    jobs = [(game_id, agents[first], agents[second], game_seed) for game_id, first, second, game_seed in tasks]
+
+    start = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(play_game, jobs, chunksize=max(1, len(jobs) // (workers * 8))))
+    else:
+        outcomes = [play_game(job) for job in jobs]
+    elapsed = time.perf_counter() - start
+
+    table = {pair: [0, 0, 0] for pair in pairings}  # wins, draws, losses of pair[0]
+    latency = [[0.0, 0] for _ in agents]
+    for (game_id, first, second, _), (_, winner, move_times) in zip(tasks, outcomes):
+        a, b = (first, second) if (first, second) in table else (second, first)
+        if winner == -1:
+            table[(a, b)][1] += 1
+        elif (first, second)[winner] == a:
+            table[(a, b)][0] += 1
+        else:
+            table[(a, b)][2] += 1
+        for side, agent in enumerate((first, second)):
+            latency[agent][0] += move_times[side][0]
+            latency[agent][1] += move_times[side][1]
+
+    pair_results = []
+    for (a, b), (w, d, l) in table.items():
+        score, low, high = score_interval(w, d, l)
+        pair_results.append({"agent": agents[a], "opponent": agents[b], "wins": w, "draws": d, "losses": l,
+                             "score": score, "score_low": low, "score_high": high,
+                             "elo_diff": elo_difference(score)})
+    ratings = elo_ratings(len(agents), [(a, b, *wdl) for (a, b), wdl in table.items()])
+    agent_results = [{"agent": spec, "elo": float(ratings[i]),
+                      "avg_move_ms": 1000 * latency[i][0] / latency[i][1] if latency[i][1] else 0.0,
+                      "moves": latency[i][1]}
+                     for i, spec in enumerate(agents)]
+    return {"mode": mode, "games_per_pairing": games, "seed": seed, "workers": workers,
+            "elapsed_s": elapsed, "pairings": pair_results, "agents": agent_results}
+
+
+def format_results(results):
+    lines = [f"{results['mode']}, {results['games_per_pairing']} games per pairing, "
+             f"{results['elapsed_s']:.1f}s with {results['workers']} worker(s)", ""]
+    lines.append(f"{'agent':<28}{'opponent':<28}{'W':>6}{'D':>6}{'L':>6}{'score':>8}{'95% CI':>16}{'Elo diff':>10}")
+    for r in results["pairings"]:
+        interval = f"[{r['score_low']:.3f}, {r['score_high']:.3f}]"
+        lines.append(f"{r['agent']:<28}{r['opponent']:<28}{r['wins']:>6}{r['draws']:>6}{r['losses']:>6}"
+                     f"{r['score']:>8.3f}{interval:>16}{round(r['elo_diff']):>+10d}")
+    lines.append("")
+    lines.append(f"{'agent':<28}{'Elo':>8}{'avg move ms':>14}{'moves':>8}")
+    for r in sorted(results["agents"], key=lambda r: -r["elo"]):
+        lines.append(f"{r['agent']:<28}{round(r['elo']):>+8d}{r['avg_move_ms']:>14.2f}{r['moves']:>8}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a headless Connect4 tournament.")
+    parser.add_argument("agents", nargs="+", help="agent specs, name[:key=value,...] with name in "
+                                                  + ", ".join(sorted(AGENTS)))
+    parser.add_argument("--games", type=int, default=100, help="games per pairing (colors alternate)")
+    parser.add_argument("--mode", choices=("round-robin", "gauntlet"), default="round-robin",
+                        help="gauntlet plays the first agent against each of the others")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the per-game seeds")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+    if len(args.agents) < 2:
+        parser.error("at least two agents are needed")
+
+    results = run_tournament(args.agents, args.games, args.mode, args.workers, args.seed)
+    print(format_results(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
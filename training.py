@@ -1,162 +1,356 @@
-from matplotlib import pyplot as plt
 from alphaBeta import AlphaBetaPlayer
-from connect4 import Connect4Game
+import time
 import torch
 import torch.nn as nn
 import torch.optim as optim
 import numpy as np
 import random
-from collections import deque
+import queue
+import torch.multiprocessing as mp
+from contextlib import nullcontext
 
-from player import RandomPlayer
-from dqnPlayer import DQNPlayer
+from dqnPlayer import DQNPlayer, encode_boards
 from dqn import Connect4DQN
+from checkpointing import AsyncCheckpointer, OpponentPool
+from metrics import MetricsRecorder
+from replay_buffer import ReplayBuffer
+from vec_env import VecConnect4Env
 
 ROWS, COLS = 6, 7
-    
+
 def game_to_tensor(board, player):
-    tensor = np.zeros_like(board, dtype=np.float32)
-    tensor[board == player] = 1
-    tensor[board == (3 - player)] = -1
-    return torch.tensor(tensor).unsqueeze(0).unsqueeze(0)
+    # same encoding as DQNPlayer uses at inference time
+    return encode_boards([board], [player])
+
+
+# moves for the opponent in the selected games: one batched pass for DQN players,
+# otherwise one get_move call per game
+def opponent_moves(opp, env, index):
+    if hasattr(opp, "select_moves"):
+        return opp.select_moves(env.boards[index], env.turns[index] + 1)
+    return np.array([opp.get_move(env.game(i), None) for i in index], dtype=np.int64)
+
+
+# one gradient step on a random minibatch from memory, returns the loss
+def optimize(policy_net, target_net, optimizer, memory, batch_size, gamma):
+    states, actions, rewards, next_states, dones = memory.sample(batch_size)
+
+    q_values = policy_net(states)
+    with torch.no_grad():
+        next_q_values = target_net(next_states)
+
+    q_value = q_values[range(batch_size), actions]
+    max_next_q = next_q_values.max(dim=1)[0]
+    target = rewards + gamma * max_next_q * (1 - dones)
+
+    loss = nn.MSELoss()(q_value, target)
+    optimizer.zero_grad()
+    loss.backward()
+    optimizer.step()
+    return loss.item()
+
+
+# Steps a VecConnect4Env with the agent playing second against an opponent that
+# moves first, and turns the agent's moves into replay transitions once their
+# outcome is known (after the opponent's reply, or at once if the move ends the game)
+class SelfPlay:
+    # metrics, when given, receives opponent think time and env step counts/timings
+    def __init__(self, num_envs, rng=None, metrics=None):
+        self.env = VecConnect4Env(num_envs)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.metrics = metrics
+        # the agent's last (state, action) in each game, waiting for its outcome
+        self.pending = [None] * num_envs
+
+    # Plays one move in every game. Returns (transitions, results) where transitions is
+    # (states, actions, rewards, next_states, dones) or None if no move was resolved, and
+    # results holds 1 (win), -1 (loss) or 0 (draw) for every game that ended
+    def step(self, policy_net, opp, epsilon):
+        env, pending = self.env, self.pending
+        agent = np.flatnonzero(env.turns == 1)
+        other = np.flatnonzero(env.turns == 0)
+        actions = np.zeros(env.num_envs, dtype=np.int64)
+
+        if len(other):
+            with self._timer("opponent"):
+                actions[other] = opponent_moves(opp, env, other)
+
+        if len(agent):
+            states = encode_boards(env.boards[agent], 2)
+            with torch.no_grad():
+                q_values = policy_net(states)
+            q_values[~torch.from_numpy(env.legal_mask(agent))] = -float('inf')
+            greedy = q_values.argmax(dim=1).numpy()
+            explore = self.rng.random(len(agent)) < epsilon
+            actions[agent] = np.where(explore, env.random_moves(agent, self.rng), greedy)
+            for j, i in enumerate(agent):
+                pending[i] = (states[j], int(actions[i]))
+
+        with self._timer("env"):
+            won, draw = env.step(actions)
+        if self.metrics is not None:
+            self.metrics.count("env_steps", env.num_envs)
+        next_states = encode_boards(env.boards, 2)
 
+        batch = ([], [], [], [], [])
+        results = []
 
-def train_dqn(episodes=10000):
+        def finish(i, reward, done):
+            state, action = pending[i]
+            for field, value in zip(batch, (state, action, reward, next_states[i], done)):
+                field.append(value)
+            pending[i] = None
+
+        for i in agent:
+            if won[i]:
+                finish(i, 1, True)
+                results.append(1)
+            elif draw[i]:
+                finish(i, 0.5, True)
+                results.append(0)
+        for i in other:
+            if pending[i] is None:
+                continue
+            if won[i]:
+                finish(i, -1, True)
+                results.append(-1)
+            elif draw[i]:
+                finish(i, 0.5, True)
+                results.append(0)
+            else:
+                finish(i, 0, False)
+
+        if not batch[1]:
+            return None, results
+        states, actions, rewards, next_states, dones = batch
+        return (torch.stack(states), actions, rewards, torch.stack(next_states), dones), results
+
+    def _timer(self, name):
+        return self.metrics.timer(name) if self.metrics is not None else nullcontext()
+
+
+# Trains the agent as the second player against an opponent that moves first.
+# num_envs games are stepped together; agent actions for all of them come from one
+# forward pass, and updates_per_step gradient updates are made per environment step.
+# replay_path keeps the replay buffer in memory-mapped files under that directory.
+# Checkpoints are written in the background every checkpoint_interval episodes (the last
+# keep_checkpoints are kept), and the opponent is refreshed from an in-memory pool of
+# the last opponent_pool_size policy snapshots. Metrics are appended to metrics_path every
+# log_interval episodes; plot them afterwards with `python metrics.py <metrics_path>`.
+def train_dqn(episodes=10000, num_envs=64, updates_per_step=0.25, opponent_depth=7,
+              replay_size=10000, replay_path=None, checkpoint_dir="checkpoints",
+              checkpoint_interval=100, keep_checkpoints=5, opponent_pool_size=1,
+              metrics_path="training_metrics.jsonl", log_interval=100):
     policy_net = Connect4DQN()
-    frozen_net = Connect4DQN()
     target_net = Connect4DQN()
-    opp = AlphaBetaPlayer(2)
+    opp = AlphaBetaPlayer(1, depth=opponent_depth)
     target_net.load_state_dict(policy_net.state_dict())
 
     optimizer = optim.Adam(policy_net.parameters(), lr=1e-3)
-    memory = deque(maxlen=10000)
+    memory = ReplayBuffer(replay_size, replay_path)
+    metrics = MetricsRecorder(metrics_path, window=100)
+    play = SelfPlay(num_envs, metrics=metrics)
+    checkpointer = AsyncCheckpointer(checkpoint_dir, checkpoint_interval, keep_checkpoints)
+    opponents = OpponentPool(opponent_pool_size)
 
     epsilon = 1.0
     gamma = 0.99
     batch_size = 200
     target_update_freq = 10
-    losses = []
-    wins = []
-    lossers = []
-    opp_wins = []
-    opp_losses = []
-    draws = []
-    ep_list = []
-    rolling_winrate = []
-
-    rolling_window = 100
-
-    for episode in range(episodes):
-        game = Connect4Game()
-        while not game.game_over:
-            
-            # Opponent (trained)
-            opp_action = opp.get_move(game, None)
-            game.play_move(opp_action)
-            if game.game_over:
-                reward = -1
+
+    episode = 0
+    update_credit = 0.0
+
+    while episode < episodes:
+        batch, results = play.step(policy_net, opp, epsilon)
+        if batch is not None:
+            memory.add(*batch)
+            metrics.count("transitions", len(batch[1]))
+
+        # Training steps
+        update_credit += updates_per_step
+        while update_credit >= 1:
+            update_credit -= 1
+            if len(memory) >= batch_size:
+                with metrics.timer("train"):
+                    metrics.observe("loss", optimize(policy_net, target_net, optimizer, memory, batch_size, gamma))
+                metrics.count("train_steps")
+
+        for result in results:
+            record_result(metrics, result)
+
+            if episode % target_update_freq == 0:
+                memory.flush()
+                target_net.load_state_dict(policy_net.state_dict())
+                opponents.add(policy_net.state_dict())
+                opp = opponents.sample(1)
+            checkpointer.maybe_save(episode, policy_net.state_dict())
+
+            epsilon = max(0.1, epsilon - 1/episodes)
+            if episode % log_interval == 0:
+                report(metrics.log(episode=episode, epsilon=epsilon))
+            episode += 1
+
+    memory.flush()
+    checkpointer.close()
+    metrics.close()
+    return policy_net
+
+
+# rolling win/loss/draw rates for one finished game (1 win, -1 loss, 0 draw)
+def record_result(metrics, result):
+    metrics.observe("win_rate", 1 if result == 1 else 0)
+    metrics.observe("loss_rate", 1 if result == -1 else 0)
+    metrics.observe("draw_rate", 1 if result == 0 else 0)
+
+
+# one progress line from a metrics record
+def report(record, extra=""):
+    print(f"Episode {record['episode']}, Epsilon: {record['epsilon']:.3f}, "
+          f"Win rate: {record.get('win_rate', 0.0):.2f}, "
+          f"Transitions/s: {record.get('transitions_per_s', 0.0):.0f}, "
+          f"Train steps/s: {record.get('train_steps_per_s', 0.0):.0f}, "
+          f"Opponent time: {record.get('opponent_s', 0.0):.1f}s{extra}")
+
+
+# Actor process for train_dqn_actors: plays self-play games with a local copy of the
+# shared policy, reloading it (and the opponent snapshot) whenever the learner
+# publishes new weights, and sends transitions to the learner through the queue
+def run_actor(actor_id, shared_net, version, lock, epsilon, transitions_queue, stop,
+              num_envs, opponent_depth, seed):
+    torch.set_num_threads(1)
+    random.seed(seed)
+    torch.manual_seed(seed)
+    play = SelfPlay(num_envs, np.random.default_rng(seed))
+    policy_net = Connect4DQN()
+    opp = AlphaBetaPlayer(1, depth=opponent_depth)
+    seen = 0
+    with lock:
+        policy_net.load_state_dict(shared_net.state_dict())
+    sent = 0
+    start = time.perf_counter()
+
+    while not stop.is_set():
+        if version.value != seen:
+            with lock:
+                seen = version.value
+                policy_net.load_state_dict(shared_net.state_dict())
+                opp = DQNPlayer(1, state_dict=shared_net.state_dict())
+        batch, results = play.step(policy_net, opp, epsilon.value)
+        if batch is None and not results:
+            continue
+        if batch is not None:
+            states, actions, rewards, next_states, dones = batch
+            batch = (states.to(torch.int8).numpy(), actions, rewards, next_states.to(torch.int8).numpy(), dones)
+            sent += len(actions)
+        message = (actor_id, batch, results, sent, time.perf_counter() - start)
+        while not stop.is_set():
+            try:
+                transitions_queue.put(message, timeout=0.1)
                 break
+            except queue.Full:
+                pass
 
-            state_tensor = game_to_tensor(game.board, game.turn + 1)
-            if random.random() < epsilon:
-                action = random.choice(game.get_valid_moves())
-            else:
-                with torch.no_grad():
-                    q_values = policy_net(state_tensor)[0]
-                    for c in range(COLS):
-                        if game.board[0][c] != 0:
-                            q_values[c] = -float('inf')
-                    action = torch.argmax(q_values).item()
-
-            if game.board[0][action] != 0:
-                continue
 
-            game.play_move(action)
-            reward = 0
-            if game.game_over:
-                reward = 1
-            elif np.all(game.board != 0):
-                reward = 0.5  # draw
-
-            next_state_tensor = game_to_tensor(game.board, game.turn + 1)
-            memory.append((state_tensor, action, reward, next_state_tensor, game.game_over))
-
-            if game.game_over: break
-
-        if reward == 1:
-            wins.append(1)
-            lossers.append(0)
-            draws.append(0)
-        elif reward == -1:
-            wins.append(0)
-            lossers.append(1)
-            draws.append(0)
-        else:
-            wins.append(0)
-            lossers.append(0)
-            draws.append(1)
-
-        ep_list.append(episode)
-
-        # Calculate rolling win rate
-        if len(wins) >= rolling_window:
-            avg_win = sum(wins[-rolling_window:]) / rolling_window
-            rolling_winrate.append(avg_win)
-        else:
-            rolling_winrate.append(sum(wins) / len(wins))
-        # Training step
-        if len(memory) >= batch_size:
-            batch = random.sample(memory, batch_size)
-            states, actions, rewards, next_states, dones = zip(*batch)
-
-            states = torch.cat(states)
-            next_states = torch.cat(next_states)
-            actions = torch.tensor(actions)
-            rewards = torch.tensor(rewards)
-            dones = torch.tensor(dones, dtype=torch.float32)
-
-            q_values = policy_net(states)
-            next_q_values = target_net(next_states)
-
-            q_value = q_values[range(batch_size), actions]
-            max_next_q = next_q_values.max(dim=1)[0]
-            target = rewards + gamma * max_next_q * (1 - dones)
-
-            loss = nn.MSELoss()(q_value, target)
-            optimizer.zero_grad()
-            loss.backward()
-            optimizer.step()
-
-            losses.append(loss.item())
-
-        if episode % target_update_freq == 0:
-            target_net.load_state_dict(policy_net.state_dict())
-            torch.save(policy_net.state_dict(), "checkpoint.pth")
-            opp = DQNPlayer(2, 'checkpoint.pth')
-
-        epsilon = max(0.1, epsilon - 1/episodes)
-        if episode % 100 == 0:
-            print(f"Episode {episode}, Epsilon: {epsilon:.3f}")
-
-
-    plt.plot(losses)
-    plt.xlabel("Training Step")
-    plt.ylabel("Loss")
-    plt.title("DQN Loss Over Time")
-    plt.grid(True)
-    plt.show()
-
-    plt.figure(figsize=(10, 5))
-    plt.plot(ep_list, rolling_winrate, label="Win Rate (rolling avg)", color="green")
-    plt.xlabel("Episode")
-    plt.ylabel("Win Rate")
-    plt.title("DQN Win Rate Over Time")
-    plt.ylim([0, 1])
-    plt.grid(True)
-    plt.legend()
-    plt.show()
+# Actor/learner training: num_actors processes each play envs_per_actor games and push
+# transitions over a queue while this process trains continuously. Actors pick up new
+# policy weights from shared memory every target_update_freq finished episodes.
+def train_dqn_actors(episodes=10000, num_actors=4, envs_per_actor=16, opponent_depth=7,
+                     replay_size=10000, replay_path=None, checkpoint_dir="checkpoints",
+                     checkpoint_interval=100, keep_checkpoints=5,
+                     metrics_path="training_metrics.jsonl", log_interval=100):
+    policy_net = Connect4DQN()
+    target_net = Connect4DQN()
+    target_net.load_state_dict(policy_net.state_dict())
+    shared_net = Connect4DQN()
+    shared_net.load_state_dict(policy_net.state_dict())
+    shared_net.share_memory()
+
+    optimizer = optim.Adam(policy_net.parameters(), lr=1e-3)
+    memory = ReplayBuffer(replay_size, replay_path)
+    checkpointer = AsyncCheckpointer(checkpoint_dir, checkpoint_interval, keep_checkpoints)
+    metrics = MetricsRecorder(metrics_path, window=100)
+
+    gamma = 0.99
+    batch_size = 200
+    target_update_freq = 10
+
+    ctx = mp.get_context("spawn")
+    version = ctx.Value('i', 0)
+    epsilon = ctx.Value('d', 1.0)
+    lock = ctx.Lock()
+    stop = ctx.Event()
+    transitions_queue = ctx.Queue(maxsize=4 * num_actors)
+    actors = [ctx.Process(target=run_actor,
+                          args=(i, shared_net, version, lock, epsilon, transitions_queue, stop,
+                                envs_per_actor, opponent_depth, random.getrandbits(32)),
+                          daemon=True)
+              for i in range(num_actors)]
+    for actor in actors:
+        actor.start()
+
+    # latest (transitions sent, seconds running) reported by each actor
+    actor_stats = [(0, 0.0)] * num_actors
+    episode = 0
+
+    try:
+        while episode < episodes:
+            # drain everything available; block only while there is nothing to train on
+            messages = []
+            try:
+                block = len(memory) < batch_size
+                while True:
+                    messages.append(transitions_queue.get(block=block, timeout=1.0 if block else None))
+                    block = False
+            except queue.Empty:
+                pass
+
+            results = []
+            for actor_id, batch, actor_results, sent, elapsed in messages:
+                if batch is not None:
+                    memory.add(*batch)
+                    metrics.count("transitions", len(batch[1]))
+                results.extend(actor_results)
+                actor_stats[actor_id] = (sent, elapsed)
+
+            if len(memory) >= batch_size:
+                with metrics.timer("train"):
+                    metrics.observe("loss", optimize(policy_net, target_net, optimizer, memory, batch_size, gamma))
+                metrics.count("train_steps")
+
+            for result in results:
+                record_result(metrics, result)
+                if episode % target_update_freq == 0:
+                    memory.flush()
+                    target_net.load_state_dict(policy_net.state_dict())
+                    with lock:
+                        shared_net.load_state_dict(policy_net.state_dict())
+                        version.value += 1
+                checkpointer.maybe_save(episode, policy_net.state_dict())
+
+                epsilon.value = max(0.1, epsilon.value - 1/episodes)
+                if episode % log_interval == 0:
+                    rates = ", ".join(f"{sent / elapsed:.0f}" if elapsed else "0" for sent, elapsed in actor_stats)
+                    report(metrics.log(episode=episode, epsilon=epsilon.value,
+                                       actor_transitions_per_s=[sent / elapsed if elapsed else 0.0
+                                                                for sent, elapsed in actor_stats]),
+                           f", Actor transitions/s: [{rates}]")
+                episode += 1
+    finally:
+        stop.set()
+        # keep draining so actors blocked on a full queue can see the stop flag and exit
+        while any(actor.is_alive() for actor in actors):
+            try:
+                transitions_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for actor in actors:
+            actor.join()
+        memory.flush()
+        checkpointer.close()
+        metrics.close()
     return policy_net
 
 if __name__ == "__main__":
     policy = train_dqn(10000)
-    torch.save(policy.state_dict(), "connect4_self.pth")
\ No newline at end of file
+    torch.save(policy.state_dict(), "connect4_self.pth")
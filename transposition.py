@@ -0,0 +1,61 @@
+"""
+Transposition table for Connect4 searches
+
+A fixed-size table of search results keyed by a position hash (see the Zobrist
+keys in bitboard.py). Each slot holds one entry:
+
+    (key, depth, flag, value, move)
+
+where `depth` is the remaining search depth the value was computed with and
+`flag` says whether the value is exact or only a lower/upper bound.
+"""
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+POLICIES = ("depth", "always")
+
+
+class TranspositionTable:
+    """Bounded hash table of search results with a configurable replacement policy.
+
+    policy="depth" keeps an existing entry for a different position if it was
+    searched deeper than the new one; policy="always" overwrites the slot.
+    """
+
+    def __init__(self, size=1 << 20, policy="depth"):
+        if size <= 0:
+            raise ValueError(f"Table size must be positive, got {size}")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown replacement policy {policy!r}, expected one of {POLICIES}")
+        self.size = size
+        self.policy = policy
+        self.entries = [None] * size
+        self.hits = 0
+        self.probes = 0
+
+    def probe(self, key):
+        """Return the stored entry for `key`, or None."""
+        self.probes += 1
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, flag, value, move):
+        """Record a search result, subject to the replacement policy."""
+        index = key % self.size
+        old = self.entries[index]
+        if self.policy == "depth" and old is not None and old[0] != key and old[1] > depth:
+            return
+        self.entries[index] = (key, depth, flag, value, move)
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.hits = 0
+        self.probes = 0
+
+    def __len__(self):
+        return sum(1 for entry in self.entries if entry is not None)
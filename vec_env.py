@@ -0,0 +1,87 @@
+"""
+Vectorized Connect4 environment
+
+VecConnect4Env steps N independent games at once on NumPy arrays. Every game
+keeps its own board, column heights and player to move, so games can be at
+different plies; a game that ends is reset in place during the same step.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from bitboard import Connect4Bitboard
+
+ROWS, COLS = 6, 7
+
+# (69, 4) flat cell indices (r * 7 + c) of every winning line
+LINE_INDEX = np.array(
+    [[r * COLS + c + i for i in range(4)] for r in range(ROWS) for c in range(COLS - 3)] +
+    [[(r + i) * COLS + c for i in range(4)] for c in range(COLS) for r in range(ROWS - 3)] +
+    [[(r + i) * COLS + c + i for i in range(4)] for r in range(ROWS - 3) for c in range(COLS - 3)] +
+    [[(r - i) * COLS + c + i for i in range(4)] for r in range(3, ROWS) for c in range(COLS - 3)])
+
+# minimal game description accepted by Connect4Bitboard.from_game
+GameView = namedtuple("GameView", "board turn game_over")
+
+
+class VecConnect4Env:
+    """N Connect4 games stepped in parallel with automatic reset."""
+
+    def __init__(self, num_envs):
+        self.num_envs = num_envs
+        self.boards = np.zeros((num_envs, ROWS, COLS), dtype=np.int8)
+        self.heights = np.zeros((num_envs, COLS), dtype=np.int64)
+        self.turns = np.zeros(num_envs, dtype=np.int64)  # 0 or 1, player to move
+        self.pieces_placed = np.zeros(num_envs, dtype=np.int64)
+
+    def reset(self, index=None):
+        """Reset the games selected by index (all games by default)."""
+        index = slice(None) if index is None else index
+        self.boards[index] = 0
+        self.heights[index] = 0
+        self.turns[index] = 0
+        self.pieces_placed[index] = 0
+
+    def legal_mask(self, index=None):
+        """(n, 7) boolean mask of the columns that are not full."""
+        boards = self.boards if index is None else self.boards[index]
+        return boards[:, 0, :] == 0
+
+    def random_moves(self, index, rng):
+        """A uniformly random legal column for each selected game."""
+        keys = rng.random((len(index), COLS))
+        keys[~self.legal_mask(index)] = -1.0
+        return keys.argmax(axis=1)
+
+    def game(self, i):
+        """Game i as a Connect4Bitboard, for agents that take a game object."""
+        view = GameView(self.boards[i].tolist(), int(self.turns[i]), False)
+        return Connect4Bitboard.from_game(view)
+
+    def step(self, actions):
+        """Play actions[i] in game i for every game.
+
+        Returns (won, draw) boolean arrays describing the move just made by
+        the player to move. Finished games are reset before returning.
+        """
+        envs = np.arange(self.num_envs)
+        actions = np.asarray(actions)
+        if not (self.heights[envs, actions] < ROWS).all():
+            raise Exception("Invalid move, column full:", actions)
+
+        pieces = (self.turns + 1).astype(np.int8)
+        rows = ROWS - 1 - self.heights[envs, actions]
+        self.boards[envs, rows, actions] = pieces
+        self.heights[envs, actions] += 1
+        self.pieces_placed += 1
+
+        cells = self.boards.reshape(self.num_envs, ROWS * COLS)[:, LINE_INDEX]
+        won = (cells == pieces[:, None, None]).all(axis=2).any(axis=1)
+        draw = ~won & (self.pieces_placed == ROWS * COLS)
+
+        self.turns ^= 1
+        done = won | draw
+        if done.any():
+            self.reset(done)
+        return won, draw